@@ -1,13 +1,68 @@
 
 import streamlit as st
 from utils.auth import init_auth, login, logout, get_current_user, is_admin
-from utils.data_processor import create_template_csv
-from datetime import datetime
-import pandas as pd
 
 # Set page config first
 st.set_page_config(page_title="OEE Calculator", page_icon="📊")
 
+# Uploads larger than this are streamed in chunks instead of read at once
+LARGE_FILE_BYTES = 50 * 1024 * 1024
+
+def _render_ingest_status(job_id, polling):
+    """
+    Show the progress or outcome of a background ingestion job. When the
+    job finishes while it is being polled the app is rerun to stop polling.
+    """
+    from utils.ingest_jobs import get_job
+    job = get_job(job_id)
+    if job is None:
+        return
+
+    if job['finished_at'] is None:
+        fraction = min(job['bytes_read'] / job['size'], 1.0) if job['size'] else 0.0
+        if job['status'] == 'publishing':
+            text = f"{job['filename']}: publishing {job['rows']:,} rows"
+        else:
+            text = f"{job['filename']}: {job['rows_read']:,} rows processed"
+        st.progress(fraction, text=text)
+        return
+
+    if polling:
+        st.rerun(scope="app")
+
+    if job['status'] == 'failed':
+        st.error(job['error'])
+        st.info("Download the template from the Help page for the correct format.")
+        return
+
+    if job['rejected']:
+        import pandas as pd
+        st.error(f"{job['rejected']:,} invalid rows were skipped.")
+        st.dataframe(pd.DataFrame(job['errors'], columns=['line', 'error']), use_container_width=True)
+    for warning in job['warnings']:
+        st.warning(warning)
+    st.success(f"Data uploaded successfully! {job['rows']:,} rows saved for future sessions.")
+    st.write("Go to the Dashboard page to view analytics.")
+
+def render_ingest_job(job_id):
+    """
+    Render the status of a background ingestion job, polling every second
+    while it runs
+    """
+    from utils.ingest_jobs import get_job
+    job = get_job(job_id)
+    if job is None:
+        return
+
+    if job['status'] == 'done' and st.session_state.get('ingest_published') != job_id:
+        # The published dataset replaces data uploaded earlier in this session
+        st.session_state['ingest_published'] = job_id
+        st.session_state.pop('data', None)
+        st.session_state.pop('data_key', None)
+
+    running = job['finished_at'] is None
+    st.fragment(_render_ingest_status, run_every=1 if running else None)(job_id, running)
+
 def main():
     # Initialize authentication
     init_auth()
@@ -54,12 +109,41 @@ def main():
         # File upload section
         uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
         if uploaded_file is not None:
-            from utils.data_processor import process_csv_file
-            df = process_csv_file(uploaded_file)
-            if df is not None:
-                st.session_state['data'] = df
-                st.success("Data uploaded successfully!")
-                st.write("Go to the Dashboard page to view analytics.")
+            if uploaded_file.size > LARGE_FILE_BYTES:
+                # Ingest large files in the background, straight to the persisted dataset
+                if st.session_state.get('ingest_upload') != uploaded_file.file_id:
+                    from utils.ingest_jobs import submit_ingest_job
+                    st.session_state['ingest_upload'] = uploaded_file.file_id
+                    st.session_state['ingest_job'] = submit_ingest_job(uploaded_file)
+            else:
+                # Processed and saved once per upload rather than on every
+                # rerun; files with errors are checked again to keep showing them
+                if st.session_state.get('saved_upload') != uploaded_file.file_id:
+                    from utils.data_processor import process_csv_file
+                    df = process_csv_file(uploaded_file)
+                    if df is not None:
+                        st.session_state.pop('ingest_job', None)
+                        # Sessions uploading the same data share one copy
+                        from utils.shared_cache import share_dataset
+                        df, st.session_state['data_key'] = share_dataset(df)
+                        st.session_state['data'] = df
+                        # Materialize the rollup cells the Dashboard and Analysis pages query
+                        from utils.parallel_oee import build_rollup_parallel
+                        from utils.rollup import build_rollups
+                        from utils.shared_cache import cached
+                        cached(st.session_state['data_key'], 'rollups', (),
+                               lambda: build_rollups(build_rollup_parallel(df)))
+                        from utils.storage import save_dataset
+                        st.session_state['saved_rows'] = save_dataset(df)
+                        st.session_state['saved_upload'] = uploaded_file.file_id
+                if st.session_state.get('saved_upload') == uploaded_file.file_id:
+                    rows = st.session_state['saved_rows']
+                    st.success(f"Data uploaded successfully! {rows:,} rows saved for future sessions.")
+                    st.write("Go to the Dashboard page to view analytics.")
+
+        # Progress of the last background upload, also after the file was removed
+        if 'ingest_job' in st.session_state:
+            render_ingest_job(st.session_state['ingest_job'])
 
 if __name__ == "__main__":
     main()
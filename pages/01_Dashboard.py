@@ -1,48 +1,125 @@
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-from utils.oee_calculator import calculate_hourly_oee, calculate_oee
-from utils.data_processor import filter_data_by_date
+from utils.oee_calculator import OEETotals, calculate_period_oee
 import pandas as pd
-from datetime import datetime, timedelta
-from utils.realtime_handler import get_realtime_data, merge_with_historical
+from utils.rollup import build_rollups, index_rollups, select_level
+from utils.shared_cache import cached, versioned_key
+from utils.refresh_scheduler import render_realtime_toggle, schedule_refresh
+from utils.downsampling import HALF_CHART_WIDTH_PX, downsample_frame, line_render_mode, max_chart_points
+from utils.profiling import profile_section, profiled, traced_page
 
 st.set_page_config(page_title="OEE Dashboard", page_icon="📈")
 
+def get_filter_options(cells):
+    """
+    Get the sorted line and part numbers present in the filtered data
+    """
+    return (
+        sorted(cells['line_number'].unique().tolist()),
+        sorted(cells['part_number'].unique().tolist())
+    )
+
+def _select_cells(indexed, level, start_date, end_date, line, part):
+    """
+    Get the cells of a rollup level for the date range and the selected
+    line and part ('All Lines' and 'All Parts' select everything)
+    """
+    line = None if line == 'All Lines' else line
+    part = None if part == 'All Parts' else part
+    return indexed[level].select(start_date, end_date, line, part)
+
+@profiled
+def compute_production_summary(indexed, start_date, end_date, line, part):
+    """
+    Calculate the overall metrics and the production summary per part and
+    line for the selected date range, line and part
+    """
+    hour_cells = _select_cells(indexed, 'H', start_date, end_date, line, part)
+
+    summary = hour_cells.groupby(['part_number', 'line_number'], observed=True).agg({
+        'total_pieces': 'sum',
+        'good_pieces': 'sum',
+        'runtime': 'sum',
+        'planned_time': 'sum'
+    }).reset_index()
+
+    summary['scrap_rate'] = (1 - summary['good_pieces'] / summary['total_pieces']) * 100
+    summary['utilization'] = (summary['runtime'] / summary['planned_time']) * 100
+
+    return {
+        'overall': OEETotals.from_frame(hour_cells).metrics(),
+        'summary': summary
+    }
+
+@profiled
+def compute_trend(indexed, freq, start_date, end_date, line, part):
+    """
+    Calculate the metrics of every `freq` period for the selected date
+    range, line and part
+    """
+    level = select_level(freq, start_date, end_date)
+    return calculate_period_oee(_select_cells(indexed, level, start_date, end_date, line, part), freq)
+
+def compute_trend_points(metrics_df, max_points):
+    """
+    Downsample the trend to at most about `max_points` points per chart for
+    the components and the OEE chart
+    """
+    return (
+        downsample_frame(metrics_df, 'timestamp', ['availability', 'performance', 'quality'], max_points),
+        downsample_frame(metrics_df, 'timestamp', ['oee'], max_points)
+    )
+
+@traced_page("Dashboard")
 def render_dashboard():
+    # The persisted dataset, the process pool and the real-time modules are
+    # only loaded by the views that use them
     if 'data' not in st.session_state:
-        st.warning("Please upload data file in the home page first.")
-        return
+        from utils.storage import dataset_exists, dataset_version, get_dataset_date_range, load_rollup
+        if not dataset_exists():
+            st.warning("Please upload data file in the home page first.")
+            return
 
     st.title("OEE Dashboard")
 
-    # Real-time mode toggle
-    if 'enable_realtime' not in st.session_state:
-        st.session_state.enable_realtime = False
+    # Chart libraries are only loaded once there is data to show
+    import plotly.express as px
+    import plotly.graph_objects as go
 
-    st.session_state.enable_realtime = st.sidebar.checkbox("Enable Real-time Updates", value=st.session_state.enable_realtime)
-    if st.session_state.enable_realtime:
-        st.sidebar.info("Real-time updates enabled. Data will refresh automatically.")
-        st.sidebar.markdown("Last update: " + st.session_state.last_update.strftime("%Y-%m-%d %H:%M:%S"))
-        st.rerun()
-
-    df = st.session_state['data']
+    # Real-time mode toggle
+    render_realtime_toggle()
 
     # Check for real-time updates
+    realtime_df = None
     if st.session_state.enable_realtime:
+        from utils.realtime_handler import get_last_update, get_live_rollups, get_realtime_data
         realtime_df = get_realtime_data()
         if realtime_df is not None:
-            df = merge_with_historical(df, realtime_df)
             st.sidebar.success("Real-time data active")
-            last_update = st.session_state.last_update.strftime("%Y-%m-%d %H:%M:%S")
+            last_update = get_last_update().strftime("%Y-%m-%d %H:%M:%S")
             st.sidebar.info(f"Last update: {last_update}")
 
     # Date filtering
     st.sidebar.header("Date Filters")
 
-    # Get min and max dates from the data
-    min_date = df['timestamp'].min().date()
-    max_date = df['timestamp'].max().date()
+    # All views are answered from hour/part/line rollup cells instead of the
+    # raw records. Uploaded data is rolled up once and shared, live mode keeps
+    # running sums of every level, and the persisted dataset stores its rollup
+    # on disk. Results are cached under the key of the dataset, or in live
+    # mode under the key of its current version.
+    if 'data' in st.session_state:
+        from utils.parallel_oee import build_rollup_parallel
+        df = st.session_state['data']
+        data_key = st.session_state.get('data_key')
+        rollups = cached(data_key, 'rollups', (), lambda: build_rollups(build_rollup_parallel(df)))
+        min_date = rollups['H']['timestamp'].min().date()
+        max_date = rollups['H']['timestamp'].max().date()
+    else:
+        # Take the date range from the partition layout of the persisted dataset
+        rollups = None
+        data_key = versioned_key('store', dataset_version())
+        min_date, max_date = get_dataset_date_range()
+    if realtime_df is not None:
+        max_date = max(max_date, pd.to_datetime(realtime_df['timestamp']).max().date())
 
     # Date range selector
     start_date = st.sidebar.date_input("Start Date", min_date)
@@ -51,131 +128,127 @@ def render_dashboard():
     # Time frequency selector
     frequency = st.sidebar.selectbox(
         "Select Time Frequency",
-        options=['Daily', 'Weekly', 'Monthly', 'Yearly'],
-        index=0
+        options=['Hourly', 'Daily', 'Weekly', 'Monthly', 'Yearly'],
+        index=1
     )
 
     # Convert frequency selection to pandas frequency string
-    freq_map = {'Daily': 'D', 'Weekly': 'W', 'Monthly': 'M', 'Yearly': 'Y'}
+    freq_map = {'Hourly': 'h', 'Daily': 'D', 'Weekly': 'W', 'Monthly': 'M', 'Yearly': 'Y'}
     selected_freq = freq_map[frequency]
 
-    # Filter data by date
-    filtered_df = filter_data_by_date(
-        df, 
-        pd.Timestamp(start_date), 
-        pd.Timestamp(end_date) + pd.Timedelta(days=1),
-        selected_freq
-    )
+    start_ts = pd.Timestamp(start_date)
+    end_ts = pd.Timestamp(end_date) + pd.Timedelta(days=1)
+
+    # Read only the rollup of the selected date range from the persisted dataset
+    rollup_params = ()
+    if rollups is None:
+        rollup_params = (start_ts, end_ts)
+        rollups = cached(data_key, 'rollups', rollup_params,
+                         lambda: build_rollups(load_rollup(start_ts, end_ts)))
+
+    # Index the cells by time and line/part for date, line and part filters
+    indexed = cached(data_key, 'rollup_index', rollup_params, lambda: index_rollups(rollups))
+    if realtime_df is not None:
+        # Only the cells of new real-time data points are indexed per update
+        data_key, indexed = get_live_rollups(data_key, indexed)
+    line_options, part_options = cached(data_key, 'filter_options', (start_ts, end_ts),
+                                        lambda: get_filter_options(indexed['H'].select(start_ts, end_ts)))
 
     # Part and Line filters
     col1, col2 = st.columns(2)
     with col1:
         selected_line = st.selectbox(
             "Select Production Line",
-            options=['All Lines'] + sorted(filtered_df['line_number'].unique().tolist())
+            options=['All Lines'] + line_options
         )
 
     with col2:
         selected_part = st.selectbox(
             "Select Part Number",
-            options=['All Parts'] + sorted(filtered_df['part_number'].unique().tolist())
+            options=['All Parts'] + part_options
         )
 
-    # Apply part and line filters
-    if selected_line != 'All Lines':
-        filtered_df = filtered_df[filtered_df['line_number'] == selected_line]
-    if selected_part != 'All Parts':
-        filtered_df = filtered_df[filtered_df['part_number'] == selected_part]
-
-    # Calculate metrics based on filtered data
-    hourly_metrics = calculate_hourly_oee(filtered_df)
+    # Every stage is cached with only the selections it depends on, so
+    # changing the frequency keeps the summary and switching back to a line
+    # or part viewed before reuses all results
+    selection = (start_ts, end_ts, selected_line, selected_part)
+    view = cached(data_key, 'production_summary', selection,
+                  lambda: compute_production_summary(indexed, *selection))
 
     # OEE Gauge Chart
-    fig_gauge = go.Figure(go.Indicator(
-        mode = "gauge+number",
-        value = hourly_metrics['oee'].mean(),
-        title = {'text': "Average OEE"},
-        gauge = {
-            'axis': {'range': [None, 100]},
-            'steps': [
-                {'range': [0, 60], 'color': "lightgray"},
-                {'range': [60, 85], 'color': "gray"},
-                {'range': [85, 100], 'color': "darkblue"}
-            ],
-            'threshold': {
-                'line': {'color': "red", 'width': 4},
-                'thickness': 0.75,
-                'value': 85
+    with profile_section("Gauge chart"):
+        fig_gauge = go.Figure(go.Indicator(
+            mode = "gauge+number",
+            value = view['overall']['oee'],
+            title = {'text': "Overall OEE"},
+            gauge = {
+                'axis': {'range': [None, 100]},
+                'steps': [
+                    {'range': [0, 60], 'color': "lightgray"},
+                    {'range': [60, 85], 'color': "gray"},
+                    {'range': [85, 100], 'color': "darkblue"}
+                ],
+                'threshold': {
+                    'line': {'color': "red", 'width': 4},
+                    'thickness': 0.75,
+                    'value': 85
+                }
             }
-        }
-    ))
+        ))
 
-    st.plotly_chart(fig_gauge)
+        st.plotly_chart(fig_gauge)
 
     # Time-based trends
     col1, col2 = st.columns(2)
 
-    # Group data by selected frequency
-    freq_df = filtered_df.set_index('timestamp').resample(selected_freq).agg({
-        'runtime': 'sum',
-        'planned_time': 'sum',
-        'total_pieces': 'sum',
-        'good_pieces': 'sum',
-        'ideal_cycle_time': 'mean'
-    }).reset_index()
-
-    # Calculate OEE metrics for each period
-    metrics_over_time = []
-    for _, period_data in freq_df.iterrows():
-        metrics = calculate_oee(pd.DataFrame([period_data]))
-        metrics['timestamp'] = period_data['timestamp']
-        metrics_over_time.append(metrics)
-    
-    metrics_df = pd.DataFrame(metrics_over_time)
-
-    with col1:
-        fig_trend = px.line(metrics_df, x='timestamp', y=['availability', 'performance', 'quality'],
-                           title=f"{frequency} OEE Components Trend")
-        if st.session_state.enable_realtime:
-            fig_trend.add_annotation(
-                text="Live Updates",
-                xref="paper", yref="paper",
-                x=1, y=1,
-                showarrow=False,
-                font=dict(color="green")
-            )
-        st.plotly_chart(fig_trend)
-
-    with col2:
-        fig_oee = px.line(metrics_df, x='timestamp', y='oee',
-                         title=f"{frequency} OEE Trend")
-        if st.session_state.enable_realtime:
-            fig_oee.add_annotation(
-                text="Live Updates",
-                xref="paper", yref="paper",
-                x=1, y=1,
-                showarrow=False,
-                font=dict(color="green")
-            )
-        st.plotly_chart(fig_oee)
+    metrics_df = cached(data_key, 'trend', (selected_freq,) + selection,
+                        lambda: compute_trend(indexed, selected_freq, *selection))
+
+    # Send at most about two points per pixel of chart width to the browser
+    with profile_section("Downsample trends", rows=len(metrics_df)) as span:
+        max_points = max_chart_points(HALF_CHART_WIDTH_PX)
+        components_df, oee_df = cached(data_key, 'trend_points', (selected_freq, max_points) + selection,
+                                       lambda: compute_trend_points(metrics_df, max_points))
+        span['rows_out'] = len(components_df) + len(oee_df)
+
+    with profile_section("Trend charts", rows=len(metrics_df)):
+        with col1:
+            fig_trend = px.line(components_df, x='timestamp', y=['availability', 'performance', 'quality'],
+                               title=f"{frequency} OEE Components Trend",
+                               render_mode=line_render_mode(3 * len(components_df)))
+            if st.session_state.enable_realtime:
+                fig_trend.add_annotation(
+                    text="Live Updates",
+                    xref="paper", yref="paper",
+                    x=1, y=1,
+                    showarrow=False,
+                    font=dict(color="green")
+                )
+            st.plotly_chart(fig_trend)
+
+        with col2:
+            fig_oee = px.line(oee_df, x='timestamp', y='oee',
+                             title=f"{frequency} OEE Trend",
+                             render_mode=line_render_mode(len(oee_df)))
+            if st.session_state.enable_realtime:
+                fig_oee.add_annotation(
+                    text="Live Updates",
+                    xref="paper", yref="paper",
+                    x=1, y=1,
+                    showarrow=False,
+                    font=dict(color="green")
+                )
+            st.plotly_chart(fig_oee)
 
     # Production Summary
     st.subheader("Production Summary")
-    summary = filtered_df.groupby(['part_number', 'line_number']).agg({
-        'total_pieces': 'sum',
-        'good_pieces': 'sum',
-        'runtime': 'sum',
-        'planned_time': 'sum'
-    }).reset_index()
-
-    summary['scrap_rate'] = (1 - summary['good_pieces'] / summary['total_pieces']) * 100
-    summary['utilization'] = (summary['runtime'] / summary['planned_time']) * 100
+    summary = view['summary']
 
-    st.dataframe(summary.round(2), use_container_width=True)
+    with profile_section("Summary table", rows=len(summary)):
+        st.dataframe(summary.round(2), use_container_width=True)
 
     if st.session_state.enable_realtime:
-        st.empty()  # Placeholder for real-time updates
-        st.rerun()  # Trigger rerun for real-time updates
+        schedule_refresh()  # Rerun when new real-time data arrives
 
 if __name__ == "__main__":
     render_dashboard()
\ No newline at end of file
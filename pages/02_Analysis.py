@@ -1,29 +1,43 @@
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd #Import pandas here, as it's used in the edited code but missing in the original
-from utils.oee_calculator import calculate_oee
+from utils.oee_calculator import OEETotals, calculate_oee_grouped, calculate_period_oee
+from utils.loss_tree import LOSS_COLUMNS, LOSS_LABELS, build_loss_tree
+from utils.downsampling import FULL_CHART_WIDTH_PX, downsample_frame, line_render_mode, max_chart_points
+from utils.shared_cache import cached, versioned_key
+from utils.rollup import build_rollups, select_rollup
+from utils.refresh_scheduler import render_realtime_toggle, schedule_refresh
+from utils.profiling import profile_section, traced_page
 
 st.set_page_config(page_title="OEE Analysis", page_icon="🔍")
 
+@traced_page("Analysis")
 def render_analysis():
+    # The persisted dataset and the process pool are only loaded by the
+    # views that use them
     if 'data' not in st.session_state:
-        st.warning("Please upload data file in the home page first.")
-        return
+        from utils.storage import dataset_exists, dataset_version, load_rollup
+        if not dataset_exists():
+            st.warning("Please upload data file in the home page first.")
+            return
 
     st.title("OEE Analysis")
 
-    # Real-time mode toggle
-    if 'enable_realtime' not in st.session_state:
-        st.session_state.enable_realtime = False
-    
-    st.session_state.enable_realtime = st.sidebar.checkbox("Enable Real-time Updates", value=st.session_state.enable_realtime)
-    if st.session_state.enable_realtime:
-        st.sidebar.info("Real-time updates enabled. Data will refresh automatically.")
-        st.sidebar.markdown("Last update: " + st.session_state.last_update.strftime("%Y-%m-%d %H:%M:%S"))
-        st.rerun()
+    # Chart libraries are only loaded once there is data to show
+    import plotly.express as px
+    import plotly.graph_objects as go
 
-    df = st.session_state['data']
+    # Real-time mode toggle
+    render_realtime_toggle()
+
+    # Metrics are answered from hour/part/line rollup cells, shared with other
+    # sessions viewing the same dataset
+    if 'data' in st.session_state:
+        from utils.parallel_oee import build_rollup_parallel
+        df = st.session_state['data']
+        data_key = st.session_state.get('data_key')
+        rollups = cached(data_key, 'rollups', (), lambda: build_rollups(build_rollup_parallel(df)))
+    else:
+        data_key = versioned_key('store', dataset_version())
+        rollups = cached(data_key, 'rollups', (), lambda: build_rollups(load_rollup()))
     
     # Time frequency selector
     frequency = st.sidebar.selectbox(
@@ -36,43 +50,25 @@ def render_analysis():
     freq_map = {'Daily': 'D', 'Weekly': 'W', 'Monthly': 'M', 'Yearly': 'Y'}
     selected_freq = freq_map[frequency]
 
-    # Resample data based on selected frequency
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    resampled_df = df.set_index('timestamp').resample(selected_freq).agg({
-        'runtime': 'sum',
-        'planned_time': 'sum',
-        'total_pieces': 'sum',
-        'good_pieces': 'sum',
-        'ideal_cycle_time': 'mean',
-        'part_number': 'first',
-        'line_number': 'first'
-    }).reset_index()
+    # Resample data and calculate metrics for each time period
+    period_df = cached(data_key, 'period_oee', (selected_freq,),
+                       lambda: calculate_period_oee(select_rollup(rollups, selected_freq), selected_freq))
 
     # Part and Line Analysis
     st.subheader("Part and Line Performance")
 
     # Calculate OEE by part number and line
-    part_metrics = []
-    for part in df['part_number'].unique():
-        for line in df[df['part_number'] == part]['line_number'].unique():
-            part_data = df[(df['part_number'] == part) & (df['line_number'] == line)]
-            metrics = calculate_oee(part_data)
-            metrics.update({
-                'part_number': part,
-                'line_number': line
-            })
-            part_metrics.append(metrics)
-
-    # Convert to DataFrame for visualization
-    part_df = pd.DataFrame(part_metrics)
+    part_df = cached(data_key, 'part_line_oee', (),
+                     lambda: calculate_oee_grouped(rollups['M'], by=['part_number', 'line_number']))
 
     # Heatmap of OEE by part and line
-    fig_heatmap = px.imshow(
-        part_df.pivot(index='part_number', columns='line_number', values='oee'),
-        title="OEE Heatmap by Part and Line",
-        labels=dict(x="Line Number", y="Part Number", color="OEE %")
-    )
-    st.plotly_chart(fig_heatmap)
+    with profile_section("Heatmap", rows=len(part_df)):
+        fig_heatmap = px.imshow(
+            part_df.pivot(index='part_number', columns='line_number', values='oee'),
+            title="OEE Heatmap by Part and Line",
+            labels=dict(x="Line Number", y="Part Number", color="OEE %")
+        )
+        st.plotly_chart(fig_heatmap)
 
     # Bar chart comparing OEE components
     selected_metric = st.selectbox(
@@ -80,15 +76,16 @@ def render_analysis():
         options=['oee', 'availability', 'performance', 'quality']
     )
 
-    fig_bar = px.bar(
-        part_df,
-        x='part_number',
-        y=selected_metric,
-        color='line_number',
-        title=f"{selected_metric.upper()} Comparison by Part and Line",
-        barmode='group'
-    )
-    st.plotly_chart(fig_bar)
+    with profile_section("Comparison chart", rows=len(part_df)):
+        fig_bar = px.bar(
+            part_df,
+            x='part_number',
+            y=selected_metric,
+            color='line_number',
+            title=f"{selected_metric.upper()} Comparison by Part and Line",
+            barmode='group'
+        )
+        st.plotly_chart(fig_bar)
 
     # Detailed metrics table
     st.subheader("Detailed Metrics by Part and Line")
@@ -100,36 +97,24 @@ def render_analysis():
     # Overall Performance Analysis
     st.subheader(f"Overall Performance Analysis ")
     
-    # Calculate metrics for each time period
-    period_metrics = []
-    for _, period_data in resampled_df.iterrows():
-        period_metric = calculate_oee(pd.DataFrame([period_data]))
-        period_metric['timestamp'] = period_data['timestamp']
-        period_metrics.append(period_metric)
-    
-    period_df = pd.DataFrame(period_metrics)
-    
-    # Calculate average metrics for the selected frequency
-    avg_metrics = {
-        'availability': period_df['availability'].mean(),
-        'performance': period_df['performance'].mean(),
-        'quality': period_df['quality'].mean(),
-        'oee': period_df['oee'].mean()
-    }
+    # Metrics over all periods, from the summed partial sums so that every
+    # period counts by its planned time, runtime and pieces
+    totals = OEETotals.from_frame(period_df)
+    avg_metrics = totals.metrics()
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Total Parts Produced", f"{resampled_df['total_pieces'].sum():,.0f}")
-        st.metric("Good Parts", f"{resampled_df['good_pieces'].sum():,.0f}")
+        st.metric("Total Parts Produced", f"{period_df['total_pieces'].sum():,.0f}")
+        st.metric("Good Parts", f"{period_df['good_pieces'].sum():,.0f}")
     with col2:
-        st.metric("Total Runtime", f"{resampled_df['runtime'].sum():,.0f} mins")
-        st.metric("Planned Time", f"{resampled_df['planned_time'].sum():,.0f} mins")
+        st.metric("Total Runtime", f"{period_df['runtime'].sum():,.0f} mins")
+        st.metric("Planned Time", f"{period_df['planned_time'].sum():,.0f} mins")
     with col3:
         st.metric("Scrap Rate", f"{(1 - avg_metrics['quality']/100):.1%}")
-        st.metric("Average Cycle Time", f"{resampled_df['ideal_cycle_time'].mean():.2f} mins")
+        st.metric("Average Cycle Time", f"{totals.average_cycle_time():.2f} mins")
     
     # Display OEE metrics
-    st.subheader(f"Average OEE Metrics ({frequency})")
+    st.subheader("Overall OEE Metrics")
     oee_col1, oee_col2, oee_col3, oee_col4 = st.columns(4)
     with oee_col1:
         st.metric("Availability", f"{avg_metrics['availability']:.1f}%")
@@ -140,5 +125,60 @@ def render_analysis():
     with oee_col4:
         st.metric("OEE", f"{avg_metrics['oee']:.1f}%")
 
+    # Loss tree, drilled down from the plant to a line, a part and its hours
+    st.subheader("Loss Analysis")
+    loss_tree = cached(data_key, 'loss_tree', (), lambda: build_loss_tree(rollups['H']))
+
+    loss_col1, loss_col2 = st.columns(2)
+    with loss_col1:
+        loss_line = st.selectbox(
+            "Drill Down to Line",
+            options=['All Lines'] + loss_tree.children()['line_number'].tolist()
+        )
+    path = () if loss_line == 'All Lines' else (loss_line,)
+    with loss_col2:
+        loss_part = st.selectbox(
+            "Drill Down to Part",
+            options=['All Parts'] + (loss_tree.children(path)['part_number'].tolist() if path else []),
+            disabled=not path
+        )
+    if loss_part != 'All Parts':
+        path += (loss_part,)
+
+    node = loss_tree.node(path)
+    with profile_section("Loss waterfall"):
+        fig_losses = go.Figure(go.Waterfall(
+            x=["Planned time"] + [LOSS_LABELS[col] for col in LOSS_COLUMNS] + [LOSS_LABELS['productive_time']],
+            y=[node['planned_time']] + [-node[col] for col in LOSS_COLUMNS] + [0],
+            measure=['absolute'] + ['relative'] * len(LOSS_COLUMNS) + ['total']
+        ))
+        fig_losses.update_layout(title=f"Loss Minutes: {' / '.join(path) or 'Plant'}", yaxis_title="Minutes")
+        st.plotly_chart(fig_losses)
+    if 'planned_downtime' in node:
+        st.caption(f"{LOSS_LABELS['planned_downtime']} outside the planned time: {node['planned_downtime']:,.0f} mins")
+
+    children = loss_tree.children(path)
+    if len(path) < 2:
+        # Loss minutes of every line, or of every part of the selected line
+        st.dataframe(
+            children.drop(columns=['availability', 'performance', 'quality']).round(2),
+            hide_index=True,
+            use_container_width=True
+        )
+    else:
+        with profile_section("Hourly losses", rows=len(children)):
+            loss_df = downsample_frame(children, 'timestamp', LOSS_COLUMNS, max_chart_points(FULL_CHART_WIDTH_PX))
+            fig_hourly_losses = px.line(
+                loss_df.rename(columns=LOSS_LABELS),
+                x='timestamp',
+                y=[LOSS_LABELS[col] for col in LOSS_COLUMNS],
+                title="Hourly Loss Minutes",
+                render_mode=line_render_mode(len(LOSS_COLUMNS) * len(loss_df))
+            )
+            st.plotly_chart(fig_hourly_losses)
+
+    if st.session_state.enable_realtime:
+        schedule_refresh()  # Rerun when new real-time data arrives
+
 if __name__ == "__main__":
     render_analysis()
\ No newline at end of file
@@ -1,5 +1,6 @@
 import streamlit as st
-from utils.data_processor import create_template_csv
+from utils.data_processor import template_csv_bytes, template_frame
+from utils.refresh_scheduler import render_realtime_toggle, schedule_refresh
 import io
 
 st.set_page_config(page_title="OEE Help", page_icon="❓")
@@ -8,25 +9,13 @@ def render_help():
     st.title("OEE Calculator Help")
 
     # Real-time mode toggle
-    if 'enable_realtime' not in st.session_state:
-        st.session_state.enable_realtime = False
-    
-    st.session_state.enable_realtime = st.sidebar.checkbox("Enable Real-time Updates", value=st.session_state.enable_realtime)
-    if st.session_state.enable_realtime:
-        st.sidebar.info("Real-time updates enabled. Data will refresh automatically.")
-        st.sidebar.markdown("Last update: " + st.session_state.last_update.strftime("%Y-%m-%d %H:%M:%S"))
-        st.rerun()
+    render_realtime_toggle()
 
     # Download template section
     st.header("Download Template")
-    template_df = create_template_csv()
-
-    # Convert DataFrame to CSV
-    csv = template_df.to_csv(index=False)
-
     st.download_button(
         label="📥 Download CSV Template",
-        data=csv,
+        data=template_csv_bytes(),
         file_name="oee_template.csv",
         mime="text/csv",
         help="Click to download a sample CSV template with example data"
@@ -86,17 +75,40 @@ def render_help():
     }
     """, language="json")
 
+    st.subheader("Bulk Endpoint")
+    st.write("""
+    Gateways sending many records should use the bulk endpoint, with a JSON array of
+    records or one record per line (`Content-Type: application/x-ndjson`):
+    """)
+    st.code("""
+    POST /api/v1/production-data/bulk
+    Host: your-app-url
+    Content-Type: application/x-ndjson
+    Authorization: Bearer <your-access-token>
+    """)
+    st.write("""
+    - Records are validated with the same rules as CSV uploads; invalid records are
+      rejected and listed with their position, the others are stored
+    - Timestamps with a time zone are converted to UTC; part and line numbers are
+      limited to 32 bytes
+    - The response is sent once the records are saved:
+      `{"accepted": 99, "rejected": 1, "errors": [{"index": 4, "error": "negative value"}]}`
+    - **401**: missing or invalid access token
+    - **422**: invalid record sent to the single-record endpoint
+    - **503**: the service is busy; retry after the number of seconds in the `Retry-After` header
+    """)
+
     st.subheader("Real-time Data Rules")
     st.write("""
-    - Data is temporarily stored in memory
-    - Maximum of 1000 recent data points are retained
+    - Data is saved on the server and shared by all users of the dashboard
+    - Every data point received is included in the live OEE metrics
     - Updates occur automatically every 5 seconds
     - Historical data is preserved when real-time mode is disabled
     """)
 
     # Show example data
     st.subheader("Example Data")
-    st.dataframe(template_df, use_container_width=True)
+    st.dataframe(template_frame(), use_container_width=True)
 
     st.header("Calculations")
     st.write("""
@@ -116,5 +128,8 @@ def render_help():
     - For real-time updates, ensure your data sending frequency matches the refresh rate
     """)
 
+    if st.session_state.enable_realtime:
+        schedule_refresh()  # Rerun when new real-time data arrives
+
 if __name__ == "__main__":
     render_help()
\ No newline at end of file
@@ -1,31 +1,20 @@
 
 import streamlit as st
-from utils.data_processor import create_template_csv
+from utils.data_processor import template_csv_bytes
+from utils.refresh_scheduler import render_realtime_toggle, schedule_refresh
 import io
 
 def render_help():
     st.title("OEE Calculator Help")
 
     # Real-time mode toggle
-    if 'enable_realtime' not in st.session_state:
-        st.session_state.enable_realtime = False
-    
-    st.session_state.enable_realtime = st.sidebar.checkbox("Enable Real-time Updates", value=st.session_state.enable_realtime)
-    if st.session_state.enable_realtime:
-        st.sidebar.info("Real-time updates enabled. Data will refresh automatically.")
-        st.sidebar.markdown("Last update: " + st.session_state.last_update.strftime("%Y-%m-%d %H:%M:%S"))
-        st.rerun()
+    render_realtime_toggle()
 
     # Download template section
     st.header("Download Template")
-    template_df = create_template_csv()
-
-    # Convert DataFrame to CSV
-    csv = template_df.to_csv(index=False)
-
     st.download_button(
         label="📥 Download CSV Template",
-        data=csv,
+        data=template_csv_bytes(),
         file_name="oee_template.csv",
         mime="text/csv",
         help="Click to download a sample CSV template with example data"
@@ -54,5 +43,8 @@ def render_help():
     - **good_pieces**: Number of good pieces produced (meeting quality standards)
     """)
 
+    if st.session_state.enable_realtime:
+        schedule_refresh()  # Rerun when new real-time data arrives
+
 if __name__ == "__main__":
     render_help()
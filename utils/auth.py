@@ -34,5 +34,6 @@ def get_current_user() -> Optional[dict]:
     return st.session_state.current_user
 
 def is_admin() -> bool:
-    return (st.session_state.current_user is not None and 
-            st.session_state.current_user['role'] == 'admin')
+    # Pages opened directly have not run init_auth() yet
+    user = st.session_state.get('current_user')
+    return user is not None and user['role'] == 'admin'
@@ -0,0 +1,273 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from utils.data_processor import filter_data_by_date, ingest_csv_chunked, process_csv_file
+from utils.generate_sample_data import generate_production_data, generate_sample_data
+from utils.loss_tree import build_loss_tree
+from utils.oee_calculator import (calculate_hourly_oee, calculate_oee, calculate_oee_grouped,
+                                  calculate_period_oee)
+from utils.realtime_store import MAX_REALTIME_POINTS
+from utils.ring_buffer import RealtimeRingBuffer
+from utils.rolling_aggregates import RollingOEEState
+from utils.rollup import build_rollup, build_rollups, index_rollups
+from utils.time_index import TimeIndexedFrame
+
+# Dataset sizes benchmarked by default
+BENCHMARK_ROWS = [10_000, 100_000, 1_000_000]
+
+# Part and line cardinalities of a plant-wide dataset
+BENCHMARK_PARTS = 200
+BENCHMARK_LINES = 20
+
+# Timed runs per benchmark, after one warm-up run
+DEFAULT_REPEATS = 5
+
+# Real-time points appended per run of the real-time benchmarks
+REALTIME_POINTS = 1000
+
+# Relative slowdown of the median latency reported as a regression
+REGRESSION_THRESHOLD = 0.1
+
+RESULTS_DIR = 'benchmark_results'
+
+# Entry points whose cold start (import in a fresh interpreter) is measured
+STARTUP_MODULES = ['app', 'pages.01_Dashboard', 'pages.02_Analysis', 'pages.03_Help']
+
+# Prints the peak resident memory of the interpreter after the import
+_STARTUP_SCRIPT = (
+    "import importlib, resource, sys; importlib.import_module(sys.argv[1]); "
+    "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+)
+
+def measure(run: Callable, repeats: int = DEFAULT_REPEATS, setup: Optional[Callable] = None) -> dict:
+    """
+    Time `run` over `repeats` runs after a warm-up run, then measure its peak
+    traced memory in one extra run. When given, `setup` is called before
+    every run, outside the timing, and its result is passed to `run`.
+    Returns latencies in milliseconds and the peak memory in MB.
+    """
+    def prepare():
+        return (setup(),) if setup is not None else ()
+
+    run(*prepare())
+
+    latencies = []
+    for _ in range(repeats):
+        args = prepare()
+        start = time.perf_counter()
+        run(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    args = prepare()
+    tracemalloc.start()
+    try:
+        run(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'max_ms': float(max(latencies)),
+        'peak_mb': peak / 1024 / 1024
+    }
+
+def measure_cold_start(module: str, repeats: int = DEFAULT_REPEATS) -> dict:
+    """
+    Time importing `module` in a fresh interpreter, which is what the first
+    run of a page costs. The peak memory is the resident size reported by
+    the interpreter (Linux only, None elsewhere).
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    latencies = []
+    peak_kb = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', _STARTUP_SCRIPT, module],
+                                cwd=root, capture_output=True, text=True, check=True)
+        latencies.append((time.perf_counter() - start) * 1000)
+        peak_kb = int(result.stdout.split()[-1])
+
+    return {
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'max_ms': float(max(latencies)),
+        'peak_mb': peak_kb / 1024 if sys.platform.startswith('linux') else None
+    }
+
+def build_benchmarks(df: pd.DataFrame, csv_path: str) -> Dict[str, dict]:
+    """
+    Define the benchmarks for one dataset. Every entry has the function to
+    time, an optional setup function and the number of items (rows or
+    real-time points) it processes.
+    """
+    dashboard = importlib.import_module('pages.01_Dashboard')
+
+    timestamps = df['timestamp']
+    span = timestamps.max() - timestamps.min()
+    start = timestamps.min() + span / 3
+    end = timestamps.min() + span * 2 / 3
+    line = df['line_number'].iloc[0]
+    part = df['part_number'].iloc[0]
+
+    index = TimeIndexedFrame(df)
+    rollups = build_rollups(build_rollup(df))
+    indexed = index_rollups(rollups)
+    loss_tree = build_loss_tree(rollups['H'])
+
+    realtime_df = generate_sample_data(REALTIME_POINTS, BENCHMARK_PARTS, BENCHMARK_LINES,
+                                       output_path=None, seed=0)
+    realtime_df['timestamp'] = timestamps.max() + pd.to_timedelta(np.arange(1, REALTIME_POINTS + 1), unit='s')
+    records = realtime_df.to_dict('records')
+
+    def append_to_buffer(buffer):
+        for record in records:
+            buffer.append(record)
+
+    rows = len(df)
+    return {
+        'ingest.process_csv_file': {'run': lambda: process_csv_file(csv_path), 'items': rows},
+        'ingest.ingest_csv_chunked': {'run': lambda: ingest_csv_chunked(csv_path), 'items': rows},
+        'filter.filter_data_by_date': {'run': lambda: filter_data_by_date(df, start, end), 'items': rows},
+        'filter.time_index_select': {'run': lambda: index.select(start, end, line, part), 'items': rows},
+        'oee.calculate_oee': {'run': lambda: calculate_oee(df), 'items': rows},
+        'oee.calculate_hourly_oee': {'run': lambda: calculate_hourly_oee(df), 'items': rows},
+        'oee.calculate_period_oee': {'run': lambda: calculate_period_oee(df, 'D'), 'items': rows},
+        'oee.calculate_oee_grouped': {
+            'run': lambda: calculate_oee_grouped(df, ['part_number', 'line_number']),
+            'items': rows
+        },
+        'oee.build_rollups': {'run': lambda: build_rollups(build_rollup(df)), 'items': rows},
+        'dashboard.summary_and_trend': {
+            'run': lambda: (dashboard.compute_production_summary(indexed, start, end, 'All Lines', 'All Parts'),
+                            dashboard.compute_trend(indexed, 'D', start, end, 'All Lines', 'All Parts')),
+            'items': rows
+        },
+        'loss.build_loss_tree': {'run': lambda: build_loss_tree(rollups['H']), 'items': rows},
+        'loss.drill_down': {
+            'run': lambda: (loss_tree.node((line,)), loss_tree.children((line, part))),
+            'items': rows
+        },
+        'realtime.ring_buffer_append': {
+            'setup': lambda: RealtimeRingBuffer(MAX_REALTIME_POINTS),
+            'run': append_to_buffer,
+            'items': REALTIME_POINTS
+        },
+        'realtime.rolling_oee_add': {
+            'setup': lambda: RollingOEEState(df),
+            'run': lambda state: state.add_frame(realtime_df),
+            'items': REALTIME_POINTS
+        }
+    }
+
+def run_benchmarks(row_counts: List[int], repeats: int = DEFAULT_REPEATS,
+                   selected: Optional[List[str]] = None) -> dict:
+    """
+    Generate a dataset of every size in `row_counts` and run the benchmarks
+    whose name starts with one of `selected` (all by default)
+    """
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'repeats': repeats,
+        'runs': []
+    }
+
+    def record(name, rows, items, timing):
+        results['runs'].append({
+            'benchmark': name,
+            'rows': rows,
+            'items': items,
+            **timing,
+            'throughput': items / (timing['p50_ms'] / 1000)
+        })
+        peak = f"{timing['peak_mb']:>9.1f} MB" if timing['peak_mb'] is not None else ''
+        print(f"{name:<36} {rows:>12,} rows  p50 {timing['p50_ms']:>10.2f} ms  "
+              f"p95 {timing['p95_ms']:>10.2f} ms  peak {peak}")
+
+    def is_selected(name):
+        return not selected or any(name.startswith(prefix) for prefix in selected)
+
+    for module in STARTUP_MODULES:
+        name = f"startup.{module.rsplit('.', 1)[-1]}"
+        if is_selected(name):
+            record(name, 0, 1, measure_cold_start(module, repeats))
+
+    with tempfile.TemporaryDirectory(prefix='oee-benchmark-') as tmp:
+        for rows in row_counts:
+            csv_path = os.path.join(tmp, f'data-{rows}.csv')
+            # Seeded so that runs compared with each other process the same data
+            df = pd.concat(
+                generate_production_data(rows, BENCHMARK_PARTS, BENCHMARK_LINES, seed=0),
+                ignore_index=True
+            )
+            df.to_csv(csv_path, index=False)
+
+            for name, benchmark in build_benchmarks(df, csv_path).items():
+                if is_selected(name):
+                    timing = measure(benchmark['run'], repeats, benchmark.get('setup'))
+                    record(name, rows, benchmark['items'], timing)
+    return results
+
+def compare_results(current: dict, previous: dict, threshold: float = REGRESSION_THRESHOLD) -> pd.DataFrame:
+    """
+    Compare the median latencies of two result sets.
+    Returns one row per benchmark and size present in both, with the
+    relative change and whether it exceeds `threshold`.
+    """
+    columns = ['benchmark', 'rows', 'p50_ms', 'peak_mb']
+    merged = pd.DataFrame(current['runs'])[columns].merge(
+        pd.DataFrame(previous['runs'])[columns],
+        on=['benchmark', 'rows'],
+        suffixes=('', '_previous')
+    )
+    merged['change'] = merged['p50_ms'] / merged['p50_ms_previous'] - 1
+    merged['regression'] = merged['change'] > threshold
+    return merged
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the OEE pipeline on generated data")
+    parser.add_argument('--rows', type=int, nargs='+', default=BENCHMARK_ROWS,
+                        help="dataset sizes to benchmark")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS,
+                        help="timed runs per benchmark")
+    parser.add_argument('--only', nargs='+',
+                        help="run only benchmarks starting with these names, e.g. oee realtime")
+    parser.add_argument('--output', help="file to save the results to")
+    parser.add_argument('--compare', help="results file of a previous run to compare with")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.rows, args.repeats, args.only)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            comparison = compare_results(results, json.load(f))
+        print(comparison.to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+        regressions = comparison[comparison['regression']]
+        if not regressions.empty:
+            print(f"{len(regressions)} benchmarks slower by more than {REGRESSION_THRESHOLD:.0%}")
+
+if __name__ == "__main__":
+    main()
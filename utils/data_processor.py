@@ -1,5 +1,17 @@
+import functools
 import pandas as pd
 import streamlit as st
+from utils.profiling import profiled
+from utils.schema import concat_compact, to_compact_schema
+
+REQUIRED_COLUMNS = ['planned_time', 'runtime', 'ideal_cycle_time',
+                    'total_pieces', 'good_pieces', 'part_number', 'line_number']
+
+NUMERIC_COLUMNS = ['planned_time', 'runtime', 'ideal_cycle_time',
+                   'total_pieces', 'good_pieces']
+
+# Maximum number of row-level errors kept for reporting
+MAX_REPORTED_ERRORS = 1000
 
 def create_template_csv():
     """
@@ -17,19 +29,46 @@ def create_template_csv():
     }
     return pd.DataFrame(template_data)
 
+@functools.lru_cache(maxsize=1)
+def template_frame() -> pd.DataFrame:
+    """
+    Template data built once per process and shared by all sessions.
+    Must not be modified; use create_template_csv for a private copy.
+    """
+    return create_template_csv()
+
+@functools.lru_cache(maxsize=1)
+def template_csv_bytes() -> bytes:
+    """
+    CSV bytes of the template, built once per process
+    """
+    return template_frame().to_csv(index=False).encode('utf-8')
+
+@profiled
 def filter_data_by_date(df, start_date, end_date, frequency='D'):
     """
-    Filter dataframe by date range and resample by specified frequency
-    frequency options: 'D' for daily, 'W' for weekly, 'M' for monthly, 'Y' for yearly
+    Filter dataframe by date range (both ends inclusive). Data sorted by
+    timestamp is sliced by binary search instead of scanning every row; use
+    utils.time_index.TimeIndexedFrame for repeated date/line/part filters.
+    The frequency argument is accepted for compatibility and not used.
     """
-    df = df.copy()
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    mask = (df['timestamp'] >= start_date) & (df['timestamp'] <= end_date)
-    return df.loc[mask]
+    timestamps = pd.to_datetime(df['timestamp'])
+    if timestamps.is_monotonic_increasing:
+        start = timestamps.searchsorted(pd.Timestamp(start_date), side='left')
+        end = timestamps.searchsorted(pd.Timestamp(end_date), side='right')
+        filtered = df.iloc[start:end]
+    else:
+        filtered = df.loc[(timestamps >= start_date) & (timestamps <= end_date)]
+
+    if timestamps.dtype != df['timestamp'].dtype:
+        filtered = filtered.assign(timestamp=timestamps)
+    return filtered
 
+@profiled
 def process_csv_file(uploaded_file):
     """
-    Process the uploaded CSV file and perform initial data validation
+    Process the uploaded CSV file and perform initial data validation.
+    Valid data is returned in the compact schema of utils.schema.
     """
     try:
         # Read CSV with explicit data types
@@ -40,10 +79,7 @@ def process_csv_file(uploaded_file):
             df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
 
         # Check for required columns
-        required_columns = ['planned_time', 'runtime', 'ideal_cycle_time', 
-                          'total_pieces', 'good_pieces', 'part_number', 'line_number']
-
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
 
         if missing_columns:
             st.error(f"Missing required columns: {', '.join(missing_columns)}")
@@ -51,8 +87,7 @@ def process_csv_file(uploaded_file):
             return None
 
         # Convert numeric columns
-        numeric_columns = ['planned_time', 'runtime', 'ideal_cycle_time', 
-                         'total_pieces', 'good_pieces']
+        numeric_columns = NUMERIC_COLUMNS
         for col in numeric_columns:
             df[col] = pd.to_numeric(df[col], errors='coerce')
 
@@ -65,6 +100,10 @@ def process_csv_file(uploaded_file):
             st.error("Negative values found in the dataset. All values must be positive.")
             return None
 
+        if (df[['total_pieces', 'good_pieces']] % 1 != 0).any().any():
+            st.error("Piece counts must be whole numbers. Please check your data.")
+            return None
+
         if (df['good_pieces'] > df['total_pieces']).any():
             st.error("Good pieces cannot exceed total pieces. Please check your data.")
             return None
@@ -72,7 +111,7 @@ def process_csv_file(uploaded_file):
         if df['runtime'].max() > df['planned_time'].max():
             st.warning("Runtime exceeds planned time in some records. Please verify your data.")
 
-        return df
+        return to_compact_schema(df)
 
     except pd.errors.EmptyDataError:
         st.error("The uploaded file is empty. Please check your CSV file.")
@@ -84,4 +123,103 @@ def process_csv_file(uploaded_file):
     except Exception as e:
         st.error(f"Error processing file: {str(e)}")
         st.info("If the problem persists, please check the file format in the Help section.")
-        return None
\ No newline at end of file
+        return None
+
+def validate_chunk(chunk, line_offset=2):
+    """
+    Validate one chunk of production data row by row.
+    Returns a boolean mask of valid rows and a list of (line, message) errors,
+    where line is the row index plus `line_offset`, by default the line
+    number in the CSV file (the header is line 1).
+    """
+    for col in NUMERIC_COLUMNS:
+        chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+
+    # Rows without a timestamp cannot be stored
+    if 'timestamp' in chunk.columns:
+        timestamps = chunk['timestamp']
+    else:
+        timestamps = pd.Series(pd.NaT, index=chunk.index)
+
+    numeric = chunk[NUMERIC_COLUMNS]
+    checks = [
+        (timestamps.isna(), "missing or invalid timestamp"),
+        (numeric.isna().any(axis=1), "invalid numeric value"),
+        ((numeric < 0).any(axis=1), "negative value"),
+        ((chunk[['total_pieces', 'good_pieces']] % 1 != 0).any(axis=1), "piece counts must be whole numbers"),
+        (chunk['good_pieces'] > chunk['total_pieces'], "good pieces exceed total pieces")
+    ]
+
+    valid = pd.Series(True, index=chunk.index)
+    errors = []
+    for failed, message in checks:
+        failed = failed & valid
+        errors.extend((index + line_offset, message) for index in chunk.index[failed])
+        valid &= ~failed
+
+    errors.sort()
+    return valid, errors
+
+@profiled
+def ingest_csv_chunked(source, chunksize=100_000, writer=None, progress=None):
+    """
+    Stream a CSV file in chunks of `chunksize` rows, validating every chunk
+    and dropping invalid rows, so that peak memory is bounded by the chunk
+    size rather than the file size.
+    Cleaned chunks are staged to `writer` (a storage.DatasetWriter) when
+    given, otherwise they are combined into an in-memory dataframe.
+    `progress` is called with the number of rows read after every chunk.
+    Returns a dict with the data (None when written to disk), the counts of
+    written and rejected rows, row-level errors and warnings.
+    """
+    result = {
+        'data': None,
+        'rows': 0,
+        'rejected': 0,
+        'errors': [],
+        'warnings': [],
+        'missing_columns': []
+    }
+    chunks = []
+    rows_read = 0
+    runtime_exceeded = 0
+
+    reader = pd.read_csv(
+        source,
+        chunksize=chunksize,
+        dtype={'part_number': 'category', 'line_number': 'category'}
+    )
+    with reader:
+        for chunk in reader:
+            missing_columns = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+            if missing_columns:
+                result['missing_columns'] = missing_columns
+                return result
+
+            if 'timestamp' in chunk.columns:
+                chunk['timestamp'] = pd.to_datetime(chunk['timestamp'], errors='coerce')
+
+            valid, errors = validate_chunk(chunk)
+            result['rejected'] += len(errors)
+            result['errors'].extend(errors[:MAX_REPORTED_ERRORS - len(result['errors'])])
+
+            chunk = to_compact_schema(chunk[valid])
+            runtime_exceeded += int((chunk['runtime'] > chunk['planned_time']).sum())
+            rows_read += len(valid)
+
+            if writer is not None:
+                result['rows'] += writer.write(chunk)
+            else:
+                chunks.append(chunk)
+                result['rows'] += len(chunk)
+
+            if progress is not None:
+                progress(rows_read)
+
+    if runtime_exceeded:
+        result['warnings'].append(
+            f"Runtime exceeds planned time in {runtime_exceeded:,} records. Please verify your data."
+        )
+    if writer is None:
+        result['data'] = concat_compact(chunks)
+    return result
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+from typing import List
+
+# Approximate width in pixels of a chart spanning the page, and of one in
+# one of two page columns, in the default centered layout
+FULL_CHART_WIDTH_PX = 700
+HALF_CHART_WIDTH_PX = 350
+
+# Points kept per horizontal pixel; more cannot be told apart on screen
+POINTS_PER_PIXEL = 2
+
+# Line charts with more points than this are drawn with WebGL
+WEBGL_POINT_THRESHOLD = 1000
+
+def max_chart_points(width_px: int) -> int:
+    """
+    Number of points worth sending for a chart `width_px` pixels wide
+    """
+    return width_px * POINTS_PER_PIXEL
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: select `threshold` points of the series
+    that keep its visual shape. Always keeps the first and last point.
+    Returns the positions of the selected points in ascending order.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Edges of the threshold - 2 buckets between the first and last point
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+
+        # Area of the triangle formed with the previously selected point and
+        # the mean of the next bucket, for every candidate of this bucket
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+def minmax_indices(y: np.ndarray, buckets: int) -> np.ndarray:
+    """
+    Keep the minimum and maximum of each of `buckets` equal-sized buckets,
+    which preserves spikes exactly. Returns positions in ascending order.
+    """
+    n = len(y)
+    if 2 * buckets >= n:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    # Sorted by bucket and then value, bucket b occupies edges[b]:edges[b + 1]
+    order = np.lexsort((y, np.repeat(np.arange(buckets), np.diff(edges))))
+    return np.unique(np.concatenate([order[edges[:-1]], order[edges[1:] - 1]]))
+
+def downsample_frame(df: pd.DataFrame, x: str, columns: List[str], max_points: int,
+                     method: str = 'lttb') -> pd.DataFrame:
+    """
+    Reduce a time series frame to at most about `max_points` rows per
+    column for plotting. Points are selected per column with LTTB ('lttb')
+    or min/max bucketing ('minmax') and the rows selected for any column are
+    kept. Missing values (periods without data) are never selected.
+    """
+    if len(df) <= max_points:
+        return df
+
+    x_values = df[x].to_numpy()
+    if x_values.dtype.kind == 'M':
+        x_values = x_values.astype('datetime64[ns]').astype(np.int64)
+    x_values = x_values.astype(float)
+    keep = np.zeros(len(df), dtype=bool)
+    for column in columns:
+        values = df[column].to_numpy(dtype=float)
+        present = np.flatnonzero(~np.isnan(values))
+        if method == 'minmax':
+            selected = minmax_indices(values[present], max_points // 2)
+        else:
+            selected = lttb_indices(x_values[present] - x_values[0], values[present], max_points)
+        keep[present[selected]] = True
+    return df[keep]
+
+def line_render_mode(points: int) -> str:
+    """
+    Plotly Express render mode for a line chart with `points` points
+    """
+    return 'webgl' if points > WEBGL_POINT_THRESHOLD else 'auto'
@@ -1,43 +1,196 @@
 
+import argparse
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
+from typing import Iterator, Optional
 
-def generate_sample_data(num_rows=2000):
+# Hours of the day covered by each shift pattern
+SHIFT_PATTERNS = {
+    '3x8': range(0, 24),
+    '2x8': range(6, 22),
+    '1x8': range(8, 16)
+}
+
+# Consecutive records a line runs the same part before a changeover
+RUN_LENGTH = 8
+
+def generate_sample_data(num_rows=2000, num_parts=10, num_lines=5, freq='h',
+                         output_path='sample_data.csv', seed=None):
+    """
+    Generate random production records, one every `freq` from 2024-01-01,
+    for `num_parts` parts and `num_lines` lines.
+    The data is written to `output_path` unless it is None.
+    """
+    rng = np.random.default_rng(seed)
+    
     # Start date
     start_date = datetime(2024, 1, 1)
     
     # Generate timestamps
-    timestamps = [start_date + timedelta(hours=i) for i in range(num_rows)]
+    timestamps = pd.date_range(start_date, periods=num_rows, freq=freq)
     
-    # Part numbers (P001 to P010)
-    part_numbers = [f'P{str(i).zfill(3)}' for i in range(1, 11)]
+    # Part numbers (P001, P002, ...)
+    part_numbers = [f'P{str(i).zfill(3)}' for i in range(1, num_parts + 1)]
     
-    # Line numbers (L1 to L5)
-    line_numbers = [f'L{i}' for i in range(1, 6)]
+    # Line numbers (L1, L2, ...)
+    line_numbers = [f'L{i}' for i in range(1, num_lines + 1)]
     
     data = {
         'timestamp': timestamps,
-        'part_number': np.random.choice(part_numbers, num_rows),
-        'line_number': np.random.choice(line_numbers, num_rows),
-        'planned_time': np.random.uniform(50, 60, num_rows),  # minutes
+        'part_number': rng.choice(part_numbers, num_rows),
+        'line_number': rng.choice(line_numbers, num_rows),
+        'planned_time': rng.uniform(50, 60, num_rows),  # minutes
         'runtime': None,  # will be calculated
-        'ideal_cycle_time': np.random.uniform(0.4, 0.6, num_rows),  # minutes per piece
-        'total_pieces': np.random.randint(90, 120, num_rows),
+        'ideal_cycle_time': rng.uniform(0.4, 0.6, num_rows),  # minutes per piece
+        'total_pieces': rng.integers(90, 120, num_rows),
         'good_pieces': None  # will be calculated
     }
     
     df = pd.DataFrame(data)
     
     # Calculate runtime (slightly less than planned_time)
-    df['runtime'] = df['planned_time'] * np.random.uniform(0.9, 1.0, num_rows)
+    df['runtime'] = df['planned_time'] * rng.uniform(0.9, 1.0, num_rows)
     
     # Calculate good_pieces (slightly less than total_pieces)
-    df['good_pieces'] = (df['total_pieces'] * np.random.uniform(0.92, 0.98, num_rows)).astype(int)
+    df['good_pieces'] = (df['total_pieces'] * rng.uniform(0.92, 0.98, num_rows)).astype(int)
     
     # Save to CSV
-    df.to_csv('sample_data.csv', index=False)
+    if output_path is not None:
+        df.to_csv(output_path, index=False)
     return df
 
+def _active(starts: np.ndarray, length: int) -> np.ndarray:
+    """
+    Mark the `length` records following every event start of each line
+    (column), including the start itself
+    """
+    counts = np.cumsum(starts, axis=0)
+    ended = np.zeros_like(counts)
+    ended[length:] = counts[:-length]
+    return counts > ended
+
+def generate_production_data(num_rows: int, num_parts: int = 10, num_lines: int = 5,
+                             start_date=datetime(2024, 1, 1), freq: str = 'h',
+                             shifts: str = '3x8', downtime_rate: float = 0.02,
+                             downtime_length: int = 3, defect_burst_rate: float = 0.01,
+                             defect_burst_length: int = 4, seed: Optional[int] = None,
+                             chunk_rows: int = 1_000_000) -> Iterator[pd.DataFrame]:
+    """
+    Generate `num_rows` production records in chunks of up to `chunk_rows`
+    rows. Every line produces one record per `freq` during the hours of the
+    shift pattern (see SHIFT_PATTERNS) and runs each part for RUN_LENGTH
+    records. Downtime events cut the runtime and defect bursts raise the
+    scrap rate of a line for several consecutive records.
+    The same arguments and seed always produce the same data.
+    """
+    rng = np.random.default_rng(seed)
+    step = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+    shift_hours = np.zeros(24, dtype=bool)
+    shift_hours[list(SHIFT_PATTERNS[shifts])] = True
+
+    part_numbers = np.array([f'P{str(i).zfill(3)}' for i in range(1, num_parts + 1)])
+    line_numbers = np.array([f'L{i}' for i in range(1, num_lines + 1)])
+    # Every part has its own ideal cycle time, every line its own speed
+    part_cycle_times = rng.uniform(0.4, 0.6, num_parts)
+    line_speeds = rng.uniform(0.85, 1.0, num_lines)
+
+    start = pd.Timestamp(start_date).value
+    if step % pd.Timedelta(days=1) == pd.Timedelta(0) and not shift_hours[pd.Timestamp(start_date).hour]:
+        raise ValueError("No records fall into the shift hours with this start date and frequency")
+
+    period = 0
+    produced = 0
+    while produced < num_rows:
+        # Periods of this chunk, dropping those outside the shifts
+        periods = period + np.arange(max(chunk_rows // num_lines, 1))
+        period = periods[-1] + 1
+        timestamps = start + periods * step.value
+        hours = (timestamps // 3_600_000_000_000) % 24
+        periods, timestamps = periods[shift_hours[hours]], timestamps[shift_hours[hours]]
+        if len(periods) == 0:
+            continue
+
+        count = len(periods)
+        shape = (count, num_lines)
+        run = (periods // RUN_LENGTH)[:, None] + np.arange(num_lines) * 7919
+        parts = (run * 2654435761 + (seed or 0)) % num_parts
+
+        planned_time = np.full(shape, step / pd.Timedelta(minutes=1))
+        availability = rng.uniform(0.9, 1.0, shape)
+        downtime = _active(rng.random(shape) < downtime_rate, downtime_length)
+        availability[downtime] = rng.uniform(0.0, 0.6, int(downtime.sum()))
+        runtime = planned_time * availability
+
+        ideal_cycle_time = part_cycle_times[parts]
+        # Rounded at random so that short intervals are not biased towards zero pieces
+        ideal_pieces = runtime / ideal_cycle_time * line_speeds * rng.uniform(0.95, 1.0, shape)
+        total_pieces = np.floor(ideal_pieces + rng.random(shape)).astype('int64')
+
+        scrap_rate = rng.uniform(0.02, 0.08, shape)
+        bursts = _active(rng.random(shape) < defect_burst_rate, defect_burst_length)
+        scrap_rate[bursts] = rng.uniform(0.2, 0.5, int(bursts.sum()))
+        good_pieces = rng.binomial(total_pieces, 1 - scrap_rate)
+
+        chunk = pd.DataFrame({
+            'timestamp': pd.to_datetime(np.repeat(timestamps, num_lines)),
+            'part_number': part_numbers[parts.ravel()],
+            'line_number': np.tile(line_numbers, count),
+            'planned_time': planned_time.ravel(),
+            'runtime': runtime.ravel(),
+            'ideal_cycle_time': ideal_cycle_time.ravel(),
+            'total_pieces': total_pieces.ravel(),
+            'good_pieces': good_pieces.ravel()
+        })
+        chunk = chunk.iloc[:num_rows - produced]
+        produced += len(chunk)
+        yield chunk
+
+def write_production_data(output_path: str, num_rows: int, **kwargs) -> int:
+    """
+    Stream generate_production_data to a CSV or Parquet file (chosen by the
+    extension of `output_path`) one chunk at a time.
+    Returns the number of rows written.
+    """
+    rows = 0
+    writer = None
+    try:
+        for chunk in generate_production_data(num_rows, **kwargs):
+            if output_path.endswith('.parquet'):
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+            else:
+                chunk.to_csv(output_path, mode='w' if rows == 0 else 'a', header=rows == 0, index=False)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
 if __name__ == "__main__":
-    generate_sample_data(2000)
+    parser = argparse.ArgumentParser(description="Generate synthetic production data")
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--parts', type=int, default=10)
+    parser.add_argument('--lines', type=int, default=5)
+    parser.add_argument('--freq', default='h', help="time between records of a line")
+    parser.add_argument('--shifts', default='3x8', choices=list(SHIFT_PATTERNS))
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000)
+    parser.add_argument('--output', default='sample_data.csv', help="CSV or .parquet file")
+    args = parser.parse_args()
+
+    rows = write_production_data(
+        args.output,
+        args.rows,
+        num_parts=args.parts,
+        num_lines=args.lines,
+        freq=args.freq,
+        shifts=args.shifts,
+        seed=args.seed,
+        chunk_rows=args.chunk_rows
+    )
+    print(f"{rows:,} rows written to {args.output}")
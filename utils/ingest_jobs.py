@@ -0,0 +1,139 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+from utils.data_processor import ingest_csv_chunked
+from utils.storage import DATA_DIR, DatasetWriter
+
+logger = logging.getLogger(__name__)
+
+# Number of uploads ingested at the same time
+INGEST_WORKERS = int(os.environ.get('OEE_INGEST_WORKERS', 2))
+
+# Uploads are copied here so that jobs outlive the upload widget
+UPLOAD_DIR = os.environ.get('OEE_UPLOAD_DIR', tempfile.gettempdir())
+
+# Finished jobs kept in the job table
+MAX_FINISHED_JOBS = 50
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix='ingest')
+_jobs: Dict[str, dict] = {}
+_jobs_lock = threading.Lock()
+
+def _update_job(job_id: str, **fields):
+    with _jobs_lock:
+        _jobs[job_id].update(fields)
+
+def _prune_jobs():
+    """
+    Drop the oldest finished jobs beyond MAX_FINISHED_JOBS
+    """
+    finished = [job for job in _jobs.values() if job['status'] in ('done', 'failed')]
+    finished.sort(key=lambda job: job['finished_at'])
+    for job in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+        del _jobs[job['id']]
+
+def _run_job(job_id: str, path: str, root: str):
+    """
+    Parse, validate and convert an upload, then publish it to the dataset
+    """
+    writer = DatasetWriter(root)
+    try:
+        _update_job(job_id, status='running')
+        with open(path, 'rb') as source:
+            def progress(rows_read):
+                _update_job(job_id, rows_read=rows_read, bytes_read=source.tell())
+
+            result = ingest_csv_chunked(source, writer=writer, progress=progress)
+
+        if result['missing_columns']:
+            writer.abort()
+            status = 'failed'
+            error = f"Missing required columns: {', '.join(result['missing_columns'])}"
+        elif result['rows'] == 0:
+            writer.abort()
+            status = 'failed'
+            error = "No valid rows found in the uploaded file"
+        else:
+            _update_job(job_id, status='publishing')
+            result['rows'] = writer.commit()
+            status = 'done'
+            error = None
+
+        _update_job(
+            job_id,
+            status=status,
+            error=error,
+            rows=result['rows'],
+            rejected=result['rejected'],
+            errors=result['errors'],
+            warnings=result['warnings']
+        )
+    except pd.errors.EmptyDataError:
+        writer.abort()
+        _update_job(job_id, status='failed', error="The uploaded file is empty. Please check your CSV file.")
+    except pd.errors.ParserError:
+        writer.abort()
+        _update_job(job_id, status='failed', error="Error parsing CSV file. Please ensure it's a valid CSV format.")
+    except Exception as e:
+        writer.abort()
+        logger.exception("Ingest job %s failed", job_id)
+        _update_job(job_id, status='failed', error=f"Error processing file: {str(e)}")
+    finally:
+        os.remove(path)
+        with _jobs_lock:
+            _jobs[job_id]['finished_at'] = datetime.now()
+            _prune_jobs()
+
+def submit_ingest_job(uploaded_file, root: str = DATA_DIR) -> str:
+    """
+    Copy an uploaded CSV file to disk and ingest it into the persisted
+    dataset in a background thread.
+    Returns the job id used to follow its progress with get_job.
+    """
+    job_id = uuid.uuid4().hex
+    fd, path = tempfile.mkstemp(prefix=f"oee-upload-{job_id}-", suffix='.csv', dir=UPLOAD_DIR)
+    with os.fdopen(fd, 'wb') as target:
+        uploaded_file.seek(0)
+        shutil.copyfileobj(uploaded_file, target)
+
+    with _jobs_lock:
+        _jobs[job_id] = {
+            'id': job_id,
+            'filename': getattr(uploaded_file, 'name', os.path.basename(path)),
+            'status': 'queued',
+            'size': os.path.getsize(path),
+            'bytes_read': 0,
+            'rows_read': 0,
+            'rows': 0,
+            'rejected': 0,
+            'errors': [],
+            'warnings': [],
+            'error': None,
+            'submitted_at': datetime.now(),
+            'finished_at': None
+        }
+    _executor.submit(_run_job, job_id, path, root)
+    return job_id
+
+def get_job(job_id: str) -> Optional[dict]:
+    """
+    Get a snapshot of a job, or None if the job is unknown
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+def list_jobs() -> List[dict]:
+    """
+    Get snapshots of all jobs in the job table, newest first
+    """
+    with _jobs_lock:
+        jobs = [dict(job) for job in _jobs.values()]
+    return sorted(jobs, key=lambda job: job['submitted_at'], reverse=True)
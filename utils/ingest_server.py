@@ -0,0 +1,346 @@
+import argparse
+import asyncio
+import hmac
+import json
+import os
+import time
+import pandas as pd
+from http import HTTPStatus
+from typing import List, Optional, Tuple
+from utils.data_processor import MAX_REPORTED_ERRORS, NUMERIC_COLUMNS, validate_chunk
+from utils.realtime_log import RealtimeLog, get_realtime_log
+
+# Address the ingestion service listens on
+INGEST_HOST = os.environ.get('OEE_INGEST_HOST', '0.0.0.0')
+INGEST_PORT = int(os.environ.get('OEE_INGEST_PORT', 8600))
+
+# Access token clients send as "Authorization: Bearer <token>"
+INGEST_TOKEN = os.environ.get('OEE_INGEST_TOKEN')
+
+SINGLE_PATH = '/api/v1/production-data'
+BULK_PATH = '/api/v1/production-data/bulk'
+
+# Largest request body accepted
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# Records accepted but not yet written; requests beyond this get a 503
+MAX_QUEUED_RECORDS = 100_000
+
+# Largest batch written to the real-time log with one fsync
+MAX_BATCH_RECORDS = 20_000
+
+# Time a connection may stay idle or take to send a request
+REQUEST_TIMEOUT = 30.0
+
+# Seconds clients are asked to wait when the queue is full
+RETRY_AFTER = 1
+
+class RequestError(Exception):
+    """
+    Error answered with an HTTP status code and a JSON message
+    """
+
+    def __init__(self, status: HTTPStatus, message: str, headers: Optional[dict] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+def parse_records(body: bytes, content_type: str, bulk: bool) -> List[dict]:
+    """
+    Decode a request body into records. The single endpoint takes one JSON
+    object, the bulk endpoint a JSON array or newline-delimited JSON.
+    """
+    try:
+        text = body.decode('utf-8')
+        if bulk and 'ndjson' in content_type:
+            records = [json.loads(line) for line in text.splitlines() if line.strip()]
+        else:
+            records = json.loads(text)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}")
+
+    if not bulk:
+        records = [records]
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        expected = "an array of objects" if bulk else "an object"
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"Request body must be {expected}")
+    return records
+
+def validate_records(records: List[dict]) -> Tuple[pd.DataFrame, List[Tuple[int, str]]]:
+    """
+    Validate records with the same row rules as CSV uploads, and require a
+    timestamp and part and line numbers that fit the real-time log.
+    Timestamps with a time zone are converted to UTC; timestamps without
+    one are taken as they are.
+    Returns the valid records in the real-time log layout and a list of
+    (index, message) errors, where index is the position in `records`.
+    """
+    columns = ['timestamp', 'part_number', 'line_number'] + NUMERIC_COLUMNS
+    df = pd.DataFrame.from_records(records).reindex(columns=columns)
+
+    missing = df.isna().any(axis=1)
+    errors = [(index, "missing required field") for index in df.index[missing]]
+    df = df[~missing]
+    # Parsed in UTC, so that a mix of zoned and naive timestamps still gives
+    # a datetime column, with NaT for values that cannot be parsed
+    timestamps = pd.to_datetime(df['timestamp'], errors='coerce', format='mixed', utc=True)
+    df['timestamp'] = timestamps.dt.tz_convert(None)
+    valid, row_errors = validate_chunk(df, line_offset=0)
+    errors.extend(row_errors)
+
+    failed = ((df['part_number'].astype(str).str.encode('utf-8').str.len() > 32) |
+              (df['line_number'].astype(str).str.encode('utf-8').str.len() > 32)) & valid
+    errors.extend((index, "part and line numbers are limited to 32 bytes") for index in df.index[failed])
+    valid &= ~failed
+
+    errors.sort()
+    return df[valid].astype({'part_number': str, 'line_number': str}), errors
+
+class IngestServer:
+    """
+    HTTP ingestion service for real-time production data.
+    Parsed requests are queued and a single writer task drains the queue:
+    everything queued since its last write is validated as one frame and
+    appended to the real-time log with one write and fsync (group commit),
+    so the per-record cost falls as the load grows. A request is answered
+    once its records are on disk. When more than `max_queued` records are
+    waiting, new requests are rejected with 503 and a Retry-After header
+    instead of growing the queue.
+    """
+
+    def __init__(self, log: Optional[RealtimeLog] = None, token: Optional[str] = INGEST_TOKEN,
+                 max_queued: int = MAX_QUEUED_RECORDS, max_batch: int = MAX_BATCH_RECORDS):
+        if not token:
+            raise ValueError("An access token is required; set OEE_INGEST_TOKEN")
+        self.log = log or get_realtime_log()
+        self.token = token
+        self.max_queued = max_queued
+        self.max_batch = max_batch
+        self.queued = 0
+        self.stats = {'requests': 0, 'records': 0, 'rejected': 0, 'throttled': 0, 'batches': 0}
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._started = time.monotonic()
+
+    async def start(self, host: str = INGEST_HOST, port: int = INGEST_PORT) -> asyncio.base_events.Server:
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_batches())
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def stop(self):
+        """
+        Write everything still queued, then stop the writer task
+        """
+        await self._queue.join()
+        self._writer.cancel()
+        self.log.flush()
+
+    def _write_batch(self, requests: List[List[dict]]) -> List[object]:
+        """
+        Validate the records of all requests as one frame and write them with
+        one write. Rows are validated independently, so every request gets the
+        same errors as if it was validated on its own. Should that still fail,
+        each request is validated and written on its own, so that only the
+        request causing the failure fails.
+        Returns the errors of every request, or the exception it failed with.
+        """
+        try:
+            df, errors = validate_records([record for records in requests for record in records])
+            if len(df):
+                self.log.extend(df)
+        except Exception:
+            if len(requests) == 1:
+                raise
+            return [self._write_request(records) for records in requests]
+
+        # Hand every request the errors of its own records
+        results = []
+        offset = 0
+        position = 0
+        for records in requests:
+            end = offset + len(records)
+            own = []
+            while position < len(errors) and errors[position][0] < end:
+                own.append((errors[position][0] - offset, errors[position][1]))
+                position += 1
+            results.append(own)
+            offset = end
+        return results
+
+    def _write_request(self, records: List[dict]) -> object:
+        try:
+            df, errors = validate_records(records)
+            if len(df):
+                self.log.extend(df)
+            return errors
+        except Exception as e:
+            return e
+
+    async def _write_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            size = len(items[0][0])
+            while not self._queue.empty() and size < self.max_batch:
+                items.append(self._queue.get_nowait())
+                size += len(items[-1][0])
+
+            try:
+                # Validation and the fsync run outside the event loop, which
+                # keeps reading requests in the meantime
+                results = await loop.run_in_executor(
+                    None, self._write_batch, [records for records, _ in items]
+                )
+                self.stats['batches'] += 1
+            except Exception as e:
+                results = [e] * len(items)
+
+            self.queued -= size
+            for (_, done), result in zip(items, results):
+                if not done.done():
+                    if isinstance(result, Exception):
+                        done.set_exception(result)
+                    else:
+                        done.set_result(result)
+                self._queue.task_done()
+
+    async def enqueue(self, records: List[dict]) -> List[Tuple[int, str]]:
+        """
+        Queue records and wait until they are validated and written.
+        Returns the (index, message) errors of the rejected records.
+        """
+        if len(records) > self.max_queued:
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                               f"Send at most {self.max_queued:,} records per request")
+        if self.queued + len(records) > self.max_queued:
+            self.stats['throttled'] += 1
+            raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, "Ingestion queue is full, retry later",
+                               {'Retry-After': str(RETRY_AFTER)})
+        self.queued += len(records)
+        done = asyncio.get_running_loop().create_future()
+        await self._queue.put((records, done))
+        return await done
+
+    def _authorized(self, headers: dict) -> bool:
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        return scheme.lower() == 'bearer' and hmac.compare_digest(token.strip().encode(), self.token.encode())
+
+    async def handle_request(self, method: str, path: str, headers: dict, body: bytes) -> Tuple[HTTPStatus, dict]:
+        """
+        Answer one request with a status code and a JSON payload
+        """
+        path = path.split('?', 1)[0]
+        if path == '/health':
+            return HTTPStatus.OK, {'status': 'ok', 'queued': self.queued,
+                                   'uptime_s': round(time.monotonic() - self._started), **self.stats}
+        if path not in (SINGLE_PATH, BULK_PATH):
+            raise RequestError(HTTPStatus.NOT_FOUND, f"Unknown endpoint {path}")
+        if method != 'POST':
+            raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST", {'Allow': 'POST'})
+        if not self._authorized(headers):
+            raise RequestError(HTTPStatus.UNAUTHORIZED, "Missing or invalid access token",
+                               {'WWW-Authenticate': 'Bearer'})
+
+        bulk = path == BULK_PATH
+        records = parse_records(body, headers.get('content-type', ''), bulk)
+        self.stats['requests'] += 1
+        if not records:
+            return HTTPStatus.OK, {'accepted': 0, 'rejected': 0, 'errors': []}
+
+        errors = await self.enqueue(records)
+        accepted = len(records) - len(errors)
+        self.stats['records'] += accepted
+        self.stats['rejected'] += len(errors)
+        if not bulk and errors:
+            raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, errors[0][1])
+
+        return HTTPStatus.OK, {
+            'accepted': accepted,
+            'rejected': len(errors),
+            'errors': [{'index': int(index), 'error': message} for index, message in errors[:MAX_REPORTED_ERRORS]]
+        }
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serve HTTP/1.1 requests of one connection, keeping it alive between
+        requests unless the client asks to close it
+        """
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+                    if not request_line:
+                        break
+                    method, path, version = request_line.decode('latin-1').split()
+                    headers = {}
+                    while True:
+                        line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+                        name, _, value = line.decode('latin-1').partition(':')
+                        headers[name.strip().lower()] = value.strip()
+                except (ValueError, asyncio.TimeoutError, asyncio.LimitOverrunError):
+                    break
+
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version == 'HTTP/1.1')
+                extra_headers = {}
+                try:
+                    if 'chunked' in headers.get('transfer-encoding', '').lower():
+                        raise RequestError(HTTPStatus.LENGTH_REQUIRED, "Send a Content-Length header")
+                    length = int(headers.get('content-length', 0))
+                    if length > MAX_BODY_BYTES:
+                        keep_alive = False
+                        raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                           f"Request body is limited to {MAX_BODY_BYTES:,} bytes")
+                    body = await asyncio.wait_for(reader.readexactly(length), REQUEST_TIMEOUT)
+                    status, payload = await self.handle_request(method, path, headers, body)
+                except RequestError as e:
+                    status, payload, extra_headers = e.status, {'error': e.message}, e.headers
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+                except ValueError:
+                    status, payload, keep_alive = HTTPStatus.BAD_REQUEST, {'error': "Invalid request"}, False
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+
+                response = json.dumps(payload).encode('utf-8')
+                head = [
+                    f"HTTP/1.1 {status.value} {status.phrase}",
+                    "Content-Type: application/json",
+                    f"Content-Length: {len(response)}",
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}"
+                ] + [f"{name}: {value}" for name, value in extra_headers.items()]
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + response)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+async def serve(host: str = INGEST_HOST, port: int = INGEST_PORT, token: Optional[str] = INGEST_TOKEN):
+    """
+    Run the ingestion service until it is cancelled
+    """
+    ingest = IngestServer(token=token)
+    server = await ingest.start(host, port)
+    print(f"Accepting production data on http://{host}:{port}{SINGLE_PATH}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await ingest.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the production data ingestion API")
+    parser.add_argument('--host', default=INGEST_HOST)
+    parser.add_argument('--port', type=int, default=INGEST_PORT)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+from typing import Tuple
+from utils.oee_calculator import PARTIAL_SUM_COLUMNS, oee_metrics, to_partial_sums
+from utils.profiling import profiled
+
+# Losses within the planned time, in minutes, following the Six Big Losses:
+# unplanned downtime covers breakdowns and setups, speed loss minor stops and
+# reduced speed, scrap loss defects and startup rejects. Together with the
+# fully productive time they add up to the planned time.
+LOSS_COLUMNS = ['unplanned_downtime', 'speed_loss', 'scrap_loss']
+
+LOSS_LABELS = {
+    'planned_downtime': "Planned downtime",
+    'unplanned_downtime': "Unplanned downtime",
+    'speed_loss': "Speed loss",
+    'scrap_loss': "Scrap loss",
+    'productive_time': "Fully productive time"
+}
+
+# Levels below the plant, in drill-down order
+DRILL_LEVELS = ['line_number', 'part_number', 'timestamp']
+
+# Minutes in the hour of a cell, the calendar time a line can be scheduled
+HOUR_MINUTES = 60
+
+def loss_minutes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Split the planned time of every row of raw records or partial sums into
+    loss minutes per category and the fully productive time, in one
+    vectorized pass. Speed loss is negative where a line ran faster than
+    its ideal cycle time, which usually means the ideal cycle time is set
+    too high.
+    Returns one row per input row with planned_time, the LOSS_COLUMNS,
+    productive_time and the four OEE metrics.
+    """
+    sums = to_partial_sums(df)
+    planned_time = sums['planned_time'].to_numpy(dtype=float)
+    runtime = sums['runtime'].to_numpy(dtype=float)
+    ideal_time = sums['ideal_time'].to_numpy(dtype=float)
+    good_ideal_time = sums['good_ideal_time'].to_numpy(dtype=float)
+
+    losses = pd.DataFrame({
+        'planned_time': planned_time,
+        'unplanned_downtime': planned_time - runtime,
+        'speed_loss': runtime - ideal_time,
+        'scrap_loss': ideal_time - good_ideal_time,
+        'productive_time': good_ideal_time
+    }, index=sums.index)
+    metrics = oee_metrics(runtime, planned_time, sums['total_pieces'].to_numpy(dtype=float),
+                          sums['good_pieces'].to_numpy(dtype=float), ideal_time)
+    return losses.assign(**metrics)
+
+def _with_losses(sums: pd.DataFrame) -> pd.DataFrame:
+    losses = loss_minutes(sums)
+    if 'planned_downtime' in sums.columns:
+        losses.insert(0, 'planned_downtime', sums['planned_downtime'])
+    return losses
+
+class LossTree:
+    """
+    Loss minutes of every node of the plant → line → part → hour hierarchy,
+    precomputed from hour/part/line cells (see utils.rollup) so that drill
+    down queries are index lookups.
+    Planned downtime is the calendar time of the hours in which a line
+    reported data that was not planned for production (breaks, planned
+    maintenance). It belongs to the line, so it is only given for the plant
+    and line nodes.
+    """
+
+    def __init__(self, cells: pd.DataFrame):
+        cells = cells.assign(
+            timestamp=pd.to_datetime(cells['timestamp']).dt.floor('h'),
+            part_number=cells['part_number'].astype(str),
+            line_number=cells['line_number'].astype(str)
+        )
+        sums = to_partial_sums(cells)
+
+        # Parts of a line share the calendar of each hour
+        line_hours = sums.groupby(['line_number', 'timestamp'])['planned_time'].sum()
+        planned_downtime = np.clip(HOUR_MINUTES - line_hours, 0, None).groupby(level='line_number').sum()
+
+        hours = sums.groupby(DRILL_LEVELS)[PARTIAL_SUM_COLUMNS].sum()
+        parts = hours.groupby(level=DRILL_LEVELS[:2]).sum()
+        lines = parts.groupby(level=DRILL_LEVELS[0]).sum().assign(planned_downtime=planned_downtime)
+        plant = lines.sum().to_frame().T
+
+        self.levels = [_with_losses(plant), _with_losses(lines), _with_losses(parts), _with_losses(hours)]
+
+    def node(self, path: Tuple = ()) -> pd.Series:
+        """
+        Get the loss minutes and metrics of one node, given by its path of
+        (line, part, hour) keys from the plant; () is the plant itself
+        """
+        if not path:
+            return self.levels[0].iloc[0]
+        key = path[0] if len(path) == 1 else tuple(path)
+        return self.levels[len(path)].loc[key]
+
+    def children(self, path: Tuple = ()) -> pd.DataFrame:
+        """
+        Get the nodes one level below `path`, with their key in the first
+        column and the share of the parent's planned time they account for
+        """
+        level = self.levels[len(path) + 1]
+        children = level.loc[tuple(path)] if path else level
+        children = children.reset_index()
+        parent_planned = self.node(path)['planned_time']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = children['planned_time'].to_numpy() / parent_planned * 100
+        return children.assign(share=share)
+
+@profiled
+def build_loss_tree(cells: pd.DataFrame) -> LossTree:
+    """
+    Precompute the loss tree of hour/part/line cells or raw records
+    """
+    return LossTree(cells)
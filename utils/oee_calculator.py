@@ -1,41 +1,173 @@
 import pandas as pd
 import numpy as np
+from dataclasses import dataclass, fields
+from utils.profiling import profiled
 
-def calculate_oee(df):
+# Additive partial sums all metrics are derived from. ideal_time is the sum
+# of total_pieces × ideal_cycle_time, the time the pieces produced would
+# have taken at the ideal rate, and good_ideal_time the same for the good
+# pieces. Partial sums of any parts of a dataset add up to those of the
+# whole, e.g. the cells of utils.rollup, which can be aggregated further in
+# place of raw records.
+PARTIAL_SUM_COLUMNS = ['runtime', 'planned_time', 'total_pieces', 'good_pieces',
+                       'ideal_time', 'good_ideal_time', 'records']
+
+METRIC_COLUMNS = ['availability', 'performance', 'quality', 'oee']
+
+def oee_metrics(runtime, planned_time, total_pieces, good_pieces, ideal_time) -> dict:
     """
-    Calculate OEE metrics from the provided dataframe
+    Derive the four metrics (in percent) from partial sums, given as scalars
+    or as arrays of one value per group
     """
-    # Calculate Availability
-    availability = (df['runtime'].sum() / df['planned_time'].sum()) * 100
-    
-    # Calculate Performance
-    ideal_output = df['runtime'].sum() / df['ideal_cycle_time'].mean()
-    performance = (df['total_pieces'].sum() / ideal_output) * 100
-    
-    # Calculate Quality
-    quality = (df['good_pieces'].sum() / df['total_pieces'].sum()) * 100
-    
-    # Calculate OEE
-    oee = (availability * performance * quality) / 10000
-    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        availability = np.divide(runtime, planned_time) * 100
+        performance = np.divide(ideal_time, runtime) * 100
+        quality = np.divide(good_pieces, total_pieces) * 100
     return {
         'availability': availability,
         'performance': performance,
         'quality': quality,
-        'oee': oee
+        'oee': availability * performance * quality / 10000
     }
 
+@dataclass
+class OEETotals:
+    """
+    Partial sums of a set of production records. Totals of separate parts
+    (partitions, periods, real-time batches) merge by addition, so metrics
+    over any combination of parts are exact.
+    """
+    runtime: float = 0.0
+    planned_time: float = 0.0
+    total_pieces: float = 0.0
+    good_pieces: float = 0.0
+    ideal_time: float = 0.0
+    good_ideal_time: float = 0.0
+    records: int = 0
+
+    @classmethod
+    def from_arrays(cls, runtime, planned_time, ideal_cycle_time, total_pieces, good_pieces) -> 'OEETotals':
+        """
+        Reduce the columns of raw records without temporary arrays: the
+        compact int32/float32 columns are accumulated in float64 in small
+        buffered blocks, and the ideal times are dot products
+        """
+        def total(values):
+            return float(np.sum(values, dtype=np.float64))
+
+        def dot(pieces, cycle_times):
+            return float(np.einsum('i,i->', pieces, cycle_times, dtype=np.float64, casting='unsafe'))
+
+        return cls(
+            runtime=total(runtime),
+            planned_time=total(planned_time),
+            total_pieces=total(total_pieces),
+            good_pieces=total(good_pieces),
+            ideal_time=dot(total_pieces, ideal_cycle_time),
+            good_ideal_time=dot(good_pieces, ideal_cycle_time),
+            records=len(total_pieces)
+        )
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'OEETotals':
+        """
+        Reduce a dataframe of raw records or of partial sums
+        """
+        if 'ideal_time' in df.columns:
+            return cls(**{col: df[col].to_numpy().sum(dtype=np.float64) for col in PARTIAL_SUM_COLUMNS})
+        return cls.from_arrays(*(df[col].to_numpy() for col in
+                                 ('runtime', 'planned_time', 'ideal_cycle_time', 'total_pieces', 'good_pieces')))
+
+    def __add__(self, other: 'OEETotals') -> 'OEETotals':
+        return OEETotals(*(getattr(self, f.name) + getattr(other, f.name) for f in fields(self)))
+
+    def metrics(self) -> dict:
+        """
+        Get availability, performance, quality and OEE in percent
+        """
+        values = oee_metrics(self.runtime, self.planned_time, self.total_pieces,
+                             self.good_pieces, self.ideal_time)
+        return {name: float(value) for name, value in values.items()}
+
+    def average_cycle_time(self) -> float:
+        """
+        Get the piece-weighted mean ideal cycle time (NaN without pieces)
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return float(np.divide(self.ideal_time, self.total_pieces))
+
+@profiled
+def calculate_oee(df):
+    """
+    Calculate OEE metrics from the provided dataframe
+    """
+    return OEETotals.from_frame(df).metrics()
+
+def to_partial_sums(df):
+    """
+    Get the partial sum columns of raw records (one record per row); frames
+    that already hold partial sums are returned as they are. Times are
+    summed in float64, float32 would lose precision over many records.
+    """
+    if 'ideal_time' in df.columns:
+        return df
+    ideal_cycle_time = df['ideal_cycle_time'].to_numpy(dtype=np.float64)
+    # Other columns (group keys) are passed through without copying them
+    columns = {col: df[col] for col in df.columns}
+    columns.update(
+        runtime=df['runtime'].to_numpy(dtype=np.float64),
+        planned_time=df['planned_time'].to_numpy(dtype=np.float64),
+        ideal_time=df['total_pieces'].to_numpy(dtype=np.float64) * ideal_cycle_time,
+        good_ideal_time=df['good_pieces'].to_numpy(dtype=np.float64) * ideal_cycle_time,
+        records=np.ones(len(df), dtype=np.int64)
+    )
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+def calculate_oee_from_totals(totals):
+    """
+    Calculate OEE metric columns from an already aggregated dataframe (one
+    row per group or period of partial sums) using array arithmetic.
+    Returns a copy of `totals` with the piece-weighted mean ideal_cycle_time
+    and the availability, performance, quality and oee columns added.
+    """
+    columns = {col: totals[col].to_numpy(dtype=float) for col in
+               ('runtime', 'planned_time', 'total_pieces', 'good_pieces', 'ideal_time')}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ideal_cycle_time = columns['ideal_time'] / columns['total_pieces']
+    return totals.assign(ideal_cycle_time=ideal_cycle_time, **oee_metrics(**columns))
+
+@profiled
+def calculate_oee_grouped(df, by):
+    """
+    Calculate OEE metrics for every group of `by` in a single groupby pass.
+    `by` accepts anything DataFrame.groupby does: column names, Series or
+    pd.Grouper objects (e.g. pd.Grouper(key='timestamp', freq='D')).
+    `df` may hold raw records or partial sums (see PARTIAL_SUM_COLUMNS).
+    Returns one row per group with the group keys followed by the metrics.
+    """
+    sums = to_partial_sums(df)
+    totals = sums.groupby(by, observed=True)[PARTIAL_SUM_COLUMNS].sum()
+    metrics = calculate_oee_from_totals(totals)
+    return metrics[METRIC_COLUMNS].reset_index()
+
+@profiled
 def calculate_hourly_oee(df):
     """
     Calculate OEE metrics on an hourly basis
     """
-    df['hour'] = pd.to_datetime(df['timestamp']).dt.hour
-    
-    hourly_metrics = []
-    for hour in df['hour'].unique():
-        hour_data = df[df['hour'] == hour]
-        metrics = calculate_oee(hour_data)
-        metrics['hour'] = hour
-        hourly_metrics.append(metrics)
-    
-    return pd.DataFrame(hourly_metrics)
+    hour = pd.to_datetime(df['timestamp']).dt.hour.rename('hour')
+    hourly_metrics = calculate_oee_grouped(df, by=hour)
+    return hourly_metrics[METRIC_COLUMNS + ['hour']]
+
+@profiled
+def calculate_period_oee(df, freq):
+    """
+    Resample records to the given pandas frequency ('D', 'W', 'M', 'Y', ...)
+    and calculate OEE metrics for every period.
+    Returns one row per period with the timestamp, the aggregated totals and
+    the metric columns.
+    """
+    indexed = to_partial_sums(df).set_index(pd.to_datetime(df['timestamp']))
+    totals = indexed.resample(freq)[PARTIAL_SUM_COLUMNS].sum()
+    totals.index.name = 'timestamp'
+    return calculate_oee_from_totals(totals).reset_index()
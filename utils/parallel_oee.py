@@ -0,0 +1,87 @@
+import os
+import atexit
+import multiprocessing
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+from utils.rollup import KEY_COLUMNS, ROLLUP_COLUMNS, build_rollup
+from utils.profiling import profiled
+
+# Number of worker processes; 1 disables the process pool
+DEFAULT_WORKERS = int(os.environ.get('OEE_WORKERS', os.cpu_count() or 1))
+
+# Workers are started from a clean server process rather than forked from
+# the app server, whose other threads may hold locks at the time of the fork
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Smaller datasets are computed in-process, where pickling the partitions
+# would cost more than the work itself
+PARALLEL_MIN_ROWS = int(os.environ.get('OEE_PARALLEL_MIN_ROWS', 500_000))
+
+_executor = None
+_executor_workers = 0
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    """
+    Get the process pool, recreating it if the worker count changed
+    """
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != workers:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ProcessPoolExecutor(max_workers=workers,
+                                        mp_context=multiprocessing.get_context(START_METHOD))
+        _executor_workers = workers
+    return _executor
+
+@atexit.register
+def _shutdown_executor():
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+
+def partition_data(df: pd.DataFrame, partitions: int, partition_by: str = 'line_number') -> List[pd.DataFrame]:
+    """
+    Split records into at most `partitions` parts, either by line (every line
+    in exactly one part) or by time ('timestamp', contiguous time ranges of
+    roughly equal size)
+    """
+    if partition_by == 'timestamp':
+        order = np.argsort(pd.to_datetime(df['timestamp']).to_numpy(), kind='stable')
+        return [df.take(chunk) for chunk in np.array_split(order, partitions) if len(chunk)]
+
+    groups = df.groupby(partition_by, observed=True).indices
+    # Assign the largest lines first, each to the currently smallest part
+    parts = [[] for _ in range(min(partitions, len(groups)))]
+    sizes = [0] * len(parts)
+    for positions in sorted(groups.values(), key=len, reverse=True):
+        smallest = sizes.index(min(sizes))
+        parts[smallest].append(positions)
+        sizes[smallest] += len(positions)
+    return [df.take(np.sort(np.concatenate(part))) for part in parts if part]
+
+def _merge_cells(cells: List[pd.DataFrame], by: List[str]) -> pd.DataFrame:
+    """
+    Merge partial sums computed for separate partitions
+    """
+    merged = pd.concat(cells, ignore_index=True)
+    return merged.groupby(by, observed=True)[ROLLUP_COLUMNS].sum().reset_index()
+
+def _map_partitions(func, df: pd.DataFrame, workers: Optional[int], partition_by: str):
+    """
+    Apply `func` to every partition of `df`, in the process pool when the
+    dataset is large enough. Returns the list of results.
+    """
+    workers = DEFAULT_WORKERS if workers is None else workers
+    if workers <= 1 or len(df) < PARALLEL_MIN_ROWS:
+        return [func(df)]
+    return list(_get_executor(workers).map(func, partition_data(df, workers, partition_by)))
+
+@profiled
+def build_rollup_parallel(df: pd.DataFrame, workers: Optional[int] = None,
+                          partition_by: str = 'line_number') -> pd.DataFrame:
+    """
+    Same result as utils.rollup.build_rollup, with the partitions of `df`
+    aggregated in a process pool of `workers` processes
+    """
+    return _merge_cells(_map_partitions(build_rollup, df, workers, partition_by), KEY_COLUMNS)
@@ -0,0 +1,187 @@
+import contextvars
+import functools
+import json
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, List, Optional
+import pandas as pd
+
+# Finished traces kept per session
+MAX_TRACES = 20
+
+# Trace of the script run executing in the current context, None when
+# nothing is being traced (e.g. background jobs and worker processes)
+_current_trace = contextvars.ContextVar('oee_profiling_trace', default=None)
+
+def _rss_bytes() -> Optional[int]:
+    """
+    Resident memory of the process, or None where /proc is not available
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _rows(value) -> Optional[int]:
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    return None
+
+class Trace:
+    """
+    Timed spans recorded during one script run. Spans are nested by the
+    order in which sections and profiled functions are entered.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.now()
+        self.spans: List[dict] = []
+        self.duration_ms = None
+        self._start = time.perf_counter()
+        self._depth = 0
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Get the spans in start order with their nesting depth, duration in
+        milliseconds, input/output rows and resident memory delta in MB
+        """
+        columns = ['name', 'depth', 'start_ms', 'duration_ms', 'rows_in', 'rows_out', 'memory_delta_mb']
+        return pd.DataFrame(self.spans, columns=columns).sort_values('start_ms', kind='stable')
+
+@contextmanager
+def profile_section(name: str, rows: Optional[int] = None):
+    """
+    Record the duration and memory delta of a block in the current trace.
+    Yields the span so that the block can set 'rows_out'. Does nothing when
+    no trace is active.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield {}
+        return
+
+    span = {'name': name, 'depth': trace._depth, 'rows_in': rows, 'rows_out': None}
+    rss = _rss_bytes()
+    start = time.perf_counter()
+    trace._depth += 1
+    try:
+        yield span
+    finally:
+        end = time.perf_counter()
+        trace._depth -= 1
+        span['start_ms'] = (start - trace._start) * 1000
+        span['duration_ms'] = (end - start) * 1000
+        after = _rss_bytes()
+        span['memory_delta_mb'] = (after - rss) / 1024 / 1024 if rss is not None and after is not None else None
+        trace.spans.append(span)
+
+def profiled(func: Optional[Callable] = None, *, name: Optional[str] = None):
+    """
+    Decorator recording every call of a function as a span of the current
+    trace, with the rows of its first DataFrame argument and of its result.
+    Usable as @profiled or @profiled(name=...).
+    """
+    def decorate(func):
+        span_name = name or func.__qualname__
+        if name is None and func.__module__ != '__main__':
+            span_name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+
+            rows = next((_rows(arg) for arg in args if _rows(arg) is not None), None)
+            with profile_section(span_name, rows) as span:
+                result = func(*args, **kwargs)
+                span['rows_out'] = _rows(result)
+            return result
+        return wrapper
+
+    return decorate(func) if func is not None else decorate
+
+def export_traces(traces: List[Trace]) -> str:
+    """
+    Export traces in the Chrome trace event format, which can be opened in
+    chrome://tracing or https://ui.perfetto.dev
+    """
+    events = []
+    for pid, trace in enumerate(traces):
+        origin = trace.started_at.timestamp() * 1_000_000
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid,
+                       'args': {'name': f"{trace.name} {trace.started_at:%H:%M:%S}"}})
+        for span in trace.spans:
+            events.append({
+                'name': span['name'],
+                'ph': 'X',
+                'pid': pid,
+                'tid': 0,
+                'ts': origin + span['start_ms'] * 1000,
+                'dur': span['duration_ms'] * 1000,
+                'args': {key: span[key] for key in ('rows_in', 'rows_out', 'memory_delta_mb')}
+            })
+    return json.dumps({'traceEvents': events})
+
+def render_profiling_panel(traces: List[Trace]):
+    """
+    Show the spans of the last trace and the average time per span over all
+    kept traces in the sidebar, with an export of all traces
+    """
+    import streamlit as st
+
+    with st.sidebar.expander("Profiling"):
+        last = traces[-1]
+        st.write(f"Last run of {last.name}: {last.duration_ms:,.1f} ms")
+        spans = last.to_frame()
+        # Indent nested spans with em spaces, which the table does not strip
+        spans['name'] = ['\u2003' * 2 * depth + name for depth, name in zip(spans['depth'], spans['name'])]
+        st.dataframe(spans.drop(columns=['depth']).round(2), hide_index=True, use_container_width=True)
+
+        # Traces without spans are left out; concatenating empty frames is deprecated
+        frames = [frame for frame in (trace.to_frame() for trace in traces) if not frame.empty]
+        if frames:
+            history = pd.concat(frames, ignore_index=True)
+            st.write(f"Average over the last {len(traces)} runs")
+            averages = history.groupby('name')['duration_ms'].agg(['count', 'mean', 'max'])
+            st.dataframe(averages.sort_values('mean', ascending=False).round(2), use_container_width=True)
+
+        st.download_button(
+            "Export traces",
+            data=export_traces(traces),
+            file_name=f"oee-traces-{datetime.now():%Y%m%d-%H%M%S}.json",
+            mime="application/json"
+        )
+
+def traced_page(name: str):
+    """
+    Decorator tracing every run of a page render function. The traces of a
+    session are kept in its session state and shown to admins in the
+    sidebar profiling panel.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            import streamlit as st
+            from utils.auth import is_admin
+
+            trace = Trace(name)
+            token = _current_trace.set(trace)
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                _current_trace.reset(token)
+                trace.duration_ms = (time.perf_counter() - trace._start) * 1000
+                if 'profile_traces' not in st.session_state:
+                    st.session_state.profile_traces = deque(maxlen=MAX_TRACES)
+                st.session_state.profile_traces.append(trace)
+
+            if is_admin():
+                render_profiling_panel(list(st.session_state.profile_traces))
+            return result
+        return wrapper
+    return decorate
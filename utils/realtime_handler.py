@@ -1,70 +1,57 @@
 import pandas as pd
 from datetime import datetime
-import streamlit as st
-from typing import Dict, List, Optional
-
-def initialize_realtime_queue():
-    """
-    Initialize the real-time data queue in session state and load saved data
-    """
-    if 'realtime_queue' not in st.session_state:
-        st.session_state.realtime_queue = []
-        # Load saved data if exists
-        if pd.io.common.file_exists('realtime_data.csv'):
-            saved_data = pd.read_csv('realtime_data.csv')
-            saved_data['timestamp'] = pd.to_datetime(saved_data['timestamp'])
-            st.session_state.realtime_queue = saved_data.to_dict('records')
-    
-    if 'last_update' not in st.session_state:
-        st.session_state.last_update = datetime.now()
+from typing import Dict, Hashable, Optional, Tuple
+from utils.realtime_log import get_realtime_log
+from utils.realtime_store import get_log_rollups, get_realtime_store
+from utils.profiling import profiled
+from utils.shared_cache import versioned_key
+from utils.time_index import IndexedRuns, TimeIndexedFrame
 
 def add_realtime_data(data: Dict):
     """
-    Add new data point to the real-time queue and save to file
+    Save a new data point to the real-time log. All sessions see it once
+    the shared real-time store next reads the log.
     """
-    if 'realtime_queue' not in st.session_state:
-        initialize_realtime_queue()
-    
     # Convert timestamp to datetime if it's a string
     if isinstance(data.get('timestamp'), str):
         data['timestamp'] = pd.to_datetime(data['timestamp'])
-    
-    st.session_state.realtime_queue.append(data)
-    st.session_state.last_update = datetime.now()
-    
-    # Save to CSV file
-    df = pd.DataFrame([data])
-    df.to_csv('realtime_data.csv', mode='a', header=not pd.io.common.file_exists('realtime_data.csv'), index=False)
 
-def get_realtime_data() -> Optional[pd.DataFrame]:
+    # Save to the append-only log, written in batches
+    get_realtime_log().append(data)
+
+def get_data_version() -> int:
     """
-    Get current real-time data as DataFrame
+    Get a counter that changes whenever new real-time data arrives
     """
-    if 'realtime_queue' not in st.session_state or not st.session_state.realtime_queue:
-        return None
-    
-    return pd.DataFrame(st.session_state.realtime_queue)
+    return get_realtime_store().version
 
-def clear_old_data(max_points: int = 1000):
+def get_last_update() -> datetime:
     """
-    Clear old data points to prevent memory issues
+    Get the time new real-time data last arrived
     """
-    if len(st.session_state.realtime_queue) > max_points:
-        st.session_state.realtime_queue = st.session_state.realtime_queue[-max_points:]
+    return get_realtime_store().last_update
 
-def merge_with_historical(historical_df: pd.DataFrame, realtime_df: Optional[pd.DataFrame]) -> pd.DataFrame:
+def get_realtime_data() -> Optional[pd.DataFrame]:
     """
-    Merge historical and real-time data
+    Get current real-time data as DataFrame
     """
-    if realtime_df is None or realtime_df.empty:
-        return historical_df
-    
-    # Ensure timestamp columns are datetime
-    historical_df['timestamp'] = pd.to_datetime(historical_df['timestamp'])
-    realtime_df['timestamp'] = pd.to_datetime(realtime_df['timestamp'])
-    
-    # Combine and sort by timestamp
-    combined_df = pd.concat([historical_df, realtime_df], ignore_index=True)
-    combined_df = combined_df.sort_values('timestamp').reset_index(drop=True)
-    
-    return combined_df
+    _, data = get_realtime_store().snapshot()
+    if data.empty:
+        return None
+
+    return data
+
+@profiled
+def get_live_rollups(key: Optional[Hashable],
+                     indexed: Dict[str, TimeIndexedFrame]) -> Tuple[Optional[tuple], Dict[str, IndexedRuns]]:
+    """
+    Get the indexed rollups of a dataset combined with every real-time data
+    point. The cells of the real-time log are kept once per process (see
+    utils.realtime_store.LiveRollups) and, being additive, are queried
+    together with the cells of the dataset `key` rather than merged into them.
+    Returns the key of the current version in the shared cache, so that
+    results derived from it are computed once per version, and the rollups.
+    """
+    version, live = get_log_rollups().update()
+    combined = {level: IndexedRuns((cells,) + live[level].frames) for level, cells in indexed.items()}
+    return (versioned_key(('live', key), version) if key is not None else None), combined
@@ -0,0 +1,298 @@
+import atexit
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from utils.schema import to_compact_schema
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within a process
+    fcntl = None
+
+# Directory holding the real-time log segments
+LOG_DIR = os.environ.get('OEE_REALTIME_LOG_DIR', 'realtime_log')
+
+# Fixed-width record layout of one real-time data point
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<i8'),  # nanoseconds since epoch
+    ('part_number', 'S32'),
+    ('line_number', 'S32'),
+    ('planned_time', '<f8'),
+    ('runtime', '<f8'),
+    ('ideal_cycle_time', '<f8'),
+    ('total_pieces', '<i8'),
+    ('good_pieces', '<i8')
+])
+
+# Every segment starts with a magic string and the record size
+SEGMENT_MAGIC = b'OEELOG01'
+HEADER_SIZE = 16
+
+# File locked by a process while it writes to the log
+LOCK_FILE = 'writer.lock'
+
+# Read position in the log: (segment number, records read from that segment)
+LogPosition = Tuple[int, int]
+
+class RealtimeLog:
+    """
+    Append-only log of real-time data points stored as fixed-width binary
+    records in rotating segment files.
+    Appends are buffered and written with a single write and fsync once
+    `batch_size` records are pending or `flush_interval` seconds have passed
+    since the last flush (group commit). A timer writes the last pending
+    records when no further appends arrive. A segment is closed and a new one
+    started once it exceeds `max_segment_bytes`.
+    Several processes (app servers, the ingestion service) may write to the
+    same log: every write holds an exclusive lock on LOCK_FILE and appends
+    whole records to the newest segment. Readers never lock; they only read
+    the whole records present, which are a consistent prefix of the log.
+    """
+
+    def __init__(self, log_dir: str = LOG_DIR, batch_size: int = 256,
+                 flush_interval: float = 1.0, max_segment_bytes: int = 64 * 1024 * 1024):
+        self.log_dir = log_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_segment_bytes = max_segment_bytes
+        self._pending: List[tuple] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._file = None
+        self._lock_file = None
+        os.makedirs(log_dir, exist_ok=True)
+
+    def _segments(self) -> List[str]:
+        return sorted(
+            os.path.join(self.log_dir, name)
+            for name in os.listdir(self.log_dir) if name.endswith('.seg')
+        )
+
+    @staticmethod
+    def _segment_number(path: str) -> int:
+        return int(os.path.basename(path)[len('segment-'):-len('.seg')])
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.log_dir, f"segment-{number:06d}.seg")
+
+    def _open_segment(self):
+        """
+        Open the newest segment for appending, or start a new one when it is
+        full. Called with the writer lock held, as other processes may have
+        rotated the log since this one last wrote.
+        """
+        segments = self._segments()
+        if segments and os.path.getsize(segments[-1]) < self.max_segment_bytes:
+            path = segments[-1]
+        else:
+            path = self._segment_path(self._segment_number(segments[-1]) + 1 if segments else 0)
+        if self._file is not None:
+            if self._file.name == path:
+                return
+            self._file.close()
+
+        self._file = open(path, 'ab')
+
+    def _acquire_writer_lock(self):
+        if fcntl is None:
+            return
+        if self._lock_file is None:
+            self._lock_file = open(os.path.join(self.log_dir, LOCK_FILE), 'a')
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+
+    def _release_writer_lock(self):
+        if fcntl is not None and self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _to_record(data: Dict) -> tuple:
+        part_number = str(data['part_number']).encode('utf-8')
+        line_number = str(data['line_number']).encode('utf-8')
+        if len(part_number) > 32 or len(line_number) > 32:
+            raise ValueError("part_number and line_number are limited to 32 bytes")
+        return (
+            pd.Timestamp(data['timestamp']).value,
+            part_number,
+            line_number,
+            float(data['planned_time']),
+            float(data['runtime']),
+            float(data['ideal_cycle_time']),
+            int(data['total_pieces']),
+            int(data['good_pieces'])
+        )
+
+    @staticmethod
+    def _to_records(df: pd.DataFrame) -> np.ndarray:
+        records = np.empty(len(df), dtype=RECORD_DTYPE)
+        records['timestamp'] = pd.to_datetime(df['timestamp']).to_numpy('datetime64[ns]').astype('<i8')
+        for col in ('part_number', 'line_number'):
+            encoded = np.char.encode(df[col].astype(str).to_numpy(dtype=str), 'utf-8')
+            if encoded.dtype.itemsize > 32:
+                raise ValueError("part_number and line_number are limited to 32 bytes")
+            records[col] = encoded
+        for col in ('planned_time', 'runtime', 'ideal_cycle_time', 'total_pieces', 'good_pieces'):
+            records[col] = df[col].to_numpy()
+        return records
+
+    def append(self, data: Dict):
+        """
+        Add a data point to the log. It is written to disk with the next
+        group commit.
+        """
+        record = self._to_record(data)
+        with self._lock:
+            self._pending.append(record)
+            if (len(self._pending) >= self.batch_size or
+                    time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_pending)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_pending(self):
+        with self._lock:
+            self._timer = None
+            if self._pending:
+                self._flush()
+
+    def extend(self, df: pd.DataFrame):
+        """
+        Write a batch of data points to disk right away, together with any
+        pending ones, in a single write and fsync
+        """
+        records = self._to_records(df)
+        with self._lock:
+            self._flush(records)
+
+    def flush(self):
+        """
+        Write all pending data points to disk
+        """
+        with self._lock:
+            self._flush()
+
+    def _flush(self, records: Optional[np.ndarray] = None):
+        self._last_flush = time.monotonic()
+        batches = [np.array(self._pending, dtype=RECORD_DTYPE)] if self._pending else []
+        if records is not None and len(records):
+            batches.append(records)
+        if not batches:
+            return
+
+        self._acquire_writer_lock()
+        try:
+            self._open_segment()
+            size = os.fstat(self._file.fileno()).st_size
+            if size < HEADER_SIZE:
+                self._file.truncate(0)
+                self._file.write(SEGMENT_MAGIC + RECORD_DTYPE.itemsize.to_bytes(8, 'little'))
+            elif (size - HEADER_SIZE) % RECORD_DTYPE.itemsize:
+                # Drop a partially written record left behind by a crashed writer
+                self._file.truncate(size - (size - HEADER_SIZE) % RECORD_DTYPE.itemsize)
+
+            self._file.write(b''.join(batch.tobytes() for batch in batches))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = []
+        finally:
+            self._release_writer_lock()
+
+    @staticmethod
+    def _to_frame(records: np.ndarray) -> pd.DataFrame:
+        return to_compact_schema(pd.DataFrame({
+            'timestamp': pd.to_datetime(records['timestamp']),
+            'part_number': np.char.decode(records['part_number'], 'utf-8'),
+            'line_number': np.char.decode(records['line_number'], 'utf-8'),
+            'planned_time': records['planned_time'],
+            'runtime': records['runtime'],
+            'ideal_cycle_time': records['ideal_cycle_time'],
+            'total_pieces': records['total_pieces'],
+            'good_pieces': records['good_pieces']
+        }))
+
+    def _record_counts(self) -> List[Tuple[str, int]]:
+        return [
+            (path, max((os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize, 0))
+            for path in self._segments()
+        ]
+
+    def read_since(self, position: LogPosition = (0, 0),
+                   max_segments: Optional[int] = None) -> Tuple[Optional[pd.DataFrame], LogPosition]:
+        """
+        Read the data points written to disk after `position` by any process,
+        by memory mapping the segment files. With `max_segments`, reading
+        stops after that many segments with new data points.
+        Returns the data points (None when there are none) and the position
+        to continue from.
+        """
+        arrays = []
+        for path, count in self._record_counts():
+            if max_segments is not None and len(arrays) >= max_segments:
+                break
+            number = self._segment_number(path)
+            if number < position[0]:
+                continue
+            start = position[1] if number == position[0] else 0
+            if count > start:
+                records = np.memmap(path, dtype=RECORD_DTYPE, mode='r',
+                                    offset=HEADER_SIZE, shape=(count,))
+                arrays.append(np.array(records[start:]))
+            position = (number, max(count, start))
+
+        if not arrays:
+            return None, position
+        return self._to_frame(np.concatenate(arrays)), position
+
+    def tail_position(self, last: int) -> LogPosition:
+        """
+        Get the position from which read_since returns the `last` most
+        recent data points
+        """
+        counts = self._record_counts()
+        for path, count in reversed(counts):
+            if count >= last:
+                return self._segment_number(path), count - last
+            last -= count
+        return (self._segment_number(counts[0][0]), 0) if counts else (0, 0)
+
+    def replay(self) -> Optional[pd.DataFrame]:
+        """
+        Read every data point in the log, including pending ones
+        """
+        self.flush()
+        return self.read_since()[0]
+
+    def close(self):
+        """
+        Flush pending data points and close the current segment
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+_log = None
+_log_lock = threading.Lock()
+
+def get_realtime_log() -> RealtimeLog:
+    """
+    Get the process-wide real-time log shared by all sessions
+    """
+    global _log
+    with _log_lock:
+        if _log is None:
+            _log = RealtimeLog()
+            atexit.register(_log.close)
+    return _log
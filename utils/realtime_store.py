@@ -0,0 +1,139 @@
+import threading
+import time
+import pandas as pd
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from utils.realtime_log import RealtimeLog, get_realtime_log
+from utils.ring_buffer import RealtimeRingBuffer
+from utils.rolling_aggregates import RollingOEEState
+from utils.rollup import ROLLUP_LEVELS
+from utils.time_index import IndexedRuns
+
+# Number of most recent real-time data points kept in memory
+MAX_REALTIME_POINTS = 1000
+
+# Minimum seconds between two checks of the log for new data points
+POLL_INTERVAL = 0.5
+
+class RealtimeStore:
+    """
+    Most recent real-time data points of the real-time log, shared by all
+    sessions of a process.
+    The store tails the log, so it sees data points written by any process
+    (other app servers, the ingestion service). Readers get an immutable
+    snapshot together with the number of data points the store has seen,
+    which serves as the data version: sessions only keep that number, not
+    copies of the data.
+    """
+
+    def __init__(self, log: Optional[RealtimeLog] = None, capacity: int = MAX_REALTIME_POINTS,
+                 poll_interval: float = POLL_INTERVAL):
+        self.log = log or get_realtime_log()
+        self.poll_interval = poll_interval
+        self.last_update = datetime.now()
+        self._buffer = RealtimeRingBuffer(capacity)
+        self._position = self.log.tail_position(capacity)
+        self._snapshot = None
+        self._last_poll = None
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False):
+        """
+        Read data points written to the log since the last refresh. Does
+        nothing when the log was checked less than `poll_interval` ago,
+        unless `force` is set.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_poll is not None and now - self._last_poll < self.poll_interval:
+                return
+            self._last_poll = now
+
+            # Data points appended in this process are written with the
+            # next group commit; make them visible to readers right away
+            self.log.flush()
+            new_data, self._position = self.log.read_since(self._position)
+            if new_data is not None or self._snapshot is None:
+                if new_data is not None:
+                    self._buffer.extend(new_data)
+                    self.last_update = datetime.now()
+                # The buffer reuses its arrays, so readers get a copy that
+                # is only replaced, never modified
+                self._snapshot = self._buffer.to_frame().copy()
+
+    @property
+    def version(self) -> int:
+        """
+        Number of data points seen, which changes whenever new data arrives
+        """
+        self.refresh()
+        return self._buffer.total
+
+    def snapshot(self) -> Tuple[int, pd.DataFrame]:
+        """
+        Get the version and the data points it covers, oldest first
+        """
+        self.refresh()
+        with self._lock:
+            return self._buffer.total, self._snapshot
+
+class LiveRollups:
+    """
+    Running sums of every rollup level (see utils.rollup) of every data
+    point in the real-time log, kept once per process and shared by all
+    sessions and datasets; readers add them to the rollups of their dataset.
+    Each update reads the data points written since the previous one from
+    the log itself rather than from the store, so none are missed however
+    many arrived in between, and adds only them to every level. The log is
+    read one segment at a time, so catching up on a long log holds a single
+    segment in memory.
+    """
+
+    def __init__(self, log: Optional[RealtimeLog] = None):
+        self.log = log or get_realtime_log()
+        self.version = 0
+        self._states = {level: RollingOEEState(level=level) for level in ROLLUP_LEVELS}
+        self._position = (0, 0)
+        self._lock = threading.Lock()
+
+    def update(self) -> Tuple[int, Dict[str, IndexedRuns]]:
+        """
+        Add the data points written to the log since the previous update.
+        Returns the number of data points added so far, which serves as the
+        version, and the indexed cells of every level.
+        """
+        with self._lock:
+            self.log.flush()
+            while True:
+                new_data, self._position = self.log.read_since(self._position, max_segments=1)
+                if new_data is None:
+                    break
+                for state in self._states.values():
+                    state.add_frame(new_data)
+                self.version += len(new_data)
+            return self.version, {level: state.index() for level, state in self._states.items()}
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_realtime_store() -> RealtimeStore:
+    """
+    Get the process-wide real-time store shared by all sessions
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RealtimeStore()
+    return _store
+
+_live_rollups = None
+
+def get_log_rollups() -> LiveRollups:
+    """
+    Get the process-wide running sums of the real-time log
+    """
+    global _live_rollups
+    with _store_lock:
+        if _live_rollups is None:
+            _live_rollups = LiveRollups()
+    return _live_rollups
@@ -0,0 +1,72 @@
+import streamlit as st
+
+# Seconds between checks for new real-time data
+DEFAULT_REFRESH_INTERVAL = 5
+MAX_REFRESH_INTERVAL = 60
+
+# Number of checks without new data before the interval is doubled
+IDLE_CHECKS_PER_BACKOFF = 6
+
+def render_realtime_toggle() -> bool:
+    """
+    Render the real-time toggle and refresh settings in the sidebar.
+    Returns whether real-time updates are enabled.
+    """
+    if 'enable_realtime' not in st.session_state:
+        st.session_state.enable_realtime = False
+
+    st.session_state.enable_realtime = st.sidebar.checkbox("Enable Real-time Updates", value=st.session_state.enable_realtime)
+    if st.session_state.enable_realtime:
+        # Loaded on first use, pages without live data do not need it
+        from utils.realtime_handler import get_last_update
+        st.sidebar.info("Real-time updates enabled. Data will refresh automatically.")
+        st.session_state.refresh_interval = st.sidebar.slider(
+            "Refresh interval (seconds)",
+            min_value=1,
+            max_value=MAX_REFRESH_INTERVAL,
+            value=st.session_state.get('refresh_interval', DEFAULT_REFRESH_INTERVAL)
+        )
+        st.sidebar.markdown("Last update: " + get_last_update().strftime("%Y-%m-%d %H:%M:%S"))
+
+    return st.session_state.enable_realtime
+
+def _check_for_updates():
+    """
+    Rerun the page when the data version changed since it was rendered.
+    While no new data arrives the check interval is doubled every
+    IDLE_CHECKS_PER_BACKOFF checks, up to MAX_REFRESH_INTERVAL.
+    """
+    from utils.realtime_handler import get_data_version
+    state = st.session_state.refresh_state
+    if get_data_version() != state['rendered_version']:
+        state['idle_checks'] = 0
+        state['interval'] = state['base_interval']
+        st.rerun(scope="app")
+
+    state['idle_checks'] += 1
+    backoff = 2 ** (state['idle_checks'] // IDLE_CHECKS_PER_BACKOFF)
+    interval = min(state['base_interval'] * backoff, MAX_REFRESH_INTERVAL)
+    if interval != state['interval']:
+        # The check interval only changes when the page is rerun
+        state['interval'] = interval
+        st.rerun(scope="app")
+
+def schedule_refresh():
+    """
+    Schedule a check for new real-time data instead of rerunning the page
+    in a loop. The page is only rerun when the data version changes.
+    """
+    base_interval = st.session_state.get('refresh_interval', DEFAULT_REFRESH_INTERVAL)
+    state = st.session_state.get('refresh_state')
+    if state is None or state['base_interval'] != base_interval:
+        state = {
+            'base_interval': base_interval,
+            'interval': base_interval,
+            'idle_checks': 0
+        }
+        st.session_state.refresh_state = state
+
+    # Everything rendered in this run reflects the current data version
+    from utils.realtime_handler import get_data_version
+    state['rendered_version'] = get_data_version()
+    st.fragment(_check_for_updates, run_every=state['interval'])()
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+from utils.schema import CATEGORY_COLUMNS, MEASURE_DTYPES
+
+class RealtimeRingBuffer:
+    """
+    Fixed-capacity, column-oriented buffer of the most recent real-time data
+    points. Every column is a NumPy array and part/line numbers are stored as
+    categorical codes.
+    Each slot is written twice, at `i` and `i + capacity`, so the most recent
+    `n` points always form one contiguous range and windows can be exposed as
+    DataFrames over read-only views of the arrays instead of copies.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.size = 0
+        self.total = 0
+        self._next = 0
+        self._timestamps = np.zeros(2 * capacity, dtype='int64')
+        self._measures = {
+            col: np.zeros(2 * capacity, dtype=dtype) for col, dtype in MEASURE_DTYPES.items()
+        }
+        self._codes = {col: np.zeros(2 * capacity, dtype='int32') for col in CATEGORY_COLUMNS}
+        self._categories: Dict[str, List[str]] = {col: [] for col in CATEGORY_COLUMNS}
+        self._category_codes: Dict[str, Dict[str, int]] = {col: {} for col in CATEGORY_COLUMNS}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _code(self, col: str, value) -> int:
+        value = str(value)
+        code = self._category_codes[col].get(value)
+        if code is None:
+            code = len(self._categories[col])
+            self._categories[col].append(value)
+            self._category_codes[col][value] = code
+        return code
+
+    def append(self, data: Dict):
+        """
+        Add a data point, overwriting the oldest one when the buffer is full
+        """
+        slots = (self._next, self._next + self.capacity)
+        self._timestamps[slots,] = pd.Timestamp(data['timestamp']).value
+        for col in CATEGORY_COLUMNS:
+            self._codes[col][slots,] = self._code(col, data[col])
+        for col in MEASURE_DTYPES:
+            self._measures[col][slots,] = data[col]
+
+        self._next = (self._next + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.total += 1
+
+    def extend(self, df: pd.DataFrame):
+        """
+        Add all rows of a dataframe in order. Only the last `capacity` rows
+        are kept.
+        """
+        self.total += len(df)
+        df = df.iloc[-self.capacity:]
+        count = len(df)
+        if count == 0:
+            return
+
+        slots = (self._next + np.arange(count)) % self.capacity
+        slots = np.concatenate([slots, slots + self.capacity])
+        timestamps = pd.to_datetime(df['timestamp']).to_numpy(dtype='datetime64[ns]').view('int64')
+        self._timestamps[slots] = np.tile(timestamps, 2)
+        for col in CATEGORY_COLUMNS:
+            values = df[col].astype(str)
+            uniques = values.unique()
+            lookup = np.array([self._code(col, value) for value in uniques], dtype='int32')
+            codes = lookup[pd.Categorical(values, categories=uniques).codes]
+            self._codes[col][slots] = np.tile(codes, 2)
+        for col in MEASURE_DTYPES:
+            self._measures[col][slots] = np.tile(df[col].to_numpy(), 2)
+
+        self._next = (self._next + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def to_frame(self, last: Optional[int] = None) -> pd.DataFrame:
+        """
+        Get the `last` most recent data points (all by default) in
+        chronological order. Numeric columns are read-only views of the
+        buffer, so the frame is only valid until the next append.
+        """
+        count = self.size if last is None else min(last, self.size)
+        end = self._next + self.capacity
+        start = end - count
+
+        def window(array):
+            view = array[start:end]
+            view.flags.writeable = False
+            return view
+
+        columns = {'timestamp': window(self._timestamps).view('datetime64[ns]')}
+        for col in CATEGORY_COLUMNS:
+            columns[col] = pd.Categorical.from_codes(
+                window(self._codes[col]), categories=self._categories[col], validate=False
+            )
+        for col in MEASURE_DTYPES:
+            columns[col] = window(self._measures[col])
+        return pd.DataFrame(columns, copy=False)
+
+    def since(self, total: int) -> pd.DataFrame:
+        """
+        Get the data points appended after the buffer had seen `total`
+        points, as far as they are still in the buffer
+        """
+        return self.to_frame(last=self.total - total)
@@ -0,0 +1,50 @@
+import pandas as pd
+from typing import List, Optional
+from utils.rollup import build_rollup, derive_rollup
+from utils.time_index import IndexedRuns, TimeIndexedFrame
+
+class RollingOEEState:
+    """
+    Running OEE sums per hour, part and line, updated as data points
+    arrive. The cells are additive, so hourly, period and part/line views can
+    be derived from them without rescanning the raw records.
+    With `level` 'D' or 'M' the sums are kept per day or month instead, so
+    that coarser rollup levels are maintained the same way.
+    New points are summed into a run of cells of their own, indexed by time
+    and line/part, which is merged with the previous run once it has half
+    its size. This keeps O(log n) runs and merges every cell O(log n) times,
+    so adding points costs O(new points) amortized however long the history
+    is. A cell may be split across runs; its sums are the sums of its parts.
+    """
+
+    def __init__(self, df: Optional[pd.DataFrame] = None, level: str = 'H'):
+        self.level = level
+        self._runs: List[TimeIndexedFrame] = []
+        if df is not None:
+            self.add_frame(df)
+
+    def add_frame(self, df: pd.DataFrame):
+        """
+        Add all rows of a dataframe, aggregating them per cell first
+        """
+        if df.empty:
+            return
+
+        cells = build_rollup(df)
+        if self.level != 'H':
+            cells = derive_rollup(cells, self.level)
+
+        runs = self._runs + [TimeIndexedFrame(cells)]
+        while len(runs) > 1 and 2 * len(runs[-1]) >= len(runs[-2]):
+            newer, older = runs.pop(), runs.pop()
+            merged = derive_rollup(pd.concat([older.frame, newer.frame], ignore_index=True), self.level)
+            runs.append(TimeIndexedFrame(merged))
+        # Replaced rather than modified, so indexes handed out stay valid
+        self._runs = runs
+
+    def index(self) -> IndexedRuns:
+        """
+        Get the cells indexed by time and line/part, with the hour (or day,
+        month) in the timestamp column as in utils.rollup.build_rollups
+        """
+        return IndexedRuns(self._runs)
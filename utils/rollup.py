@@ -0,0 +1,79 @@
+import pandas as pd
+from typing import Dict
+from utils.oee_calculator import PARTIAL_SUM_COLUMNS, to_partial_sums
+from utils.time_index import TimeIndexedFrame
+from utils.profiling import profiled
+
+# Additive sums kept per cell (see utils.oee_calculator.PARTIAL_SUM_COLUMNS)
+ROLLUP_COLUMNS = PARTIAL_SUM_COLUMNS
+
+KEY_COLUMNS = ['timestamp', 'part_number', 'line_number']
+
+# Materialized levels, each derived from the previous, finer one
+ROLLUP_LEVELS = ['H', 'D', 'M']
+
+def _sum_cells(df: pd.DataFrame, periods: pd.Series) -> pd.DataFrame:
+    cells = df.assign(timestamp=periods).groupby(KEY_COLUMNS, observed=True)[ROLLUP_COLUMNS].sum()
+    return cells.reset_index()
+
+@profiled
+def build_rollup(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregate raw production records into additive sums per hour, part and
+    line. The hour is stored in the timestamp column, so the result can be
+    passed to the functions in utils.oee_calculator in place of the records.
+    """
+    return _sum_cells(to_partial_sums(df), pd.to_datetime(df['timestamp']).dt.floor('h'))
+
+def period_start(timestamps: pd.Series, level: str) -> pd.Series:
+    """
+    Get the start of the hour ('H'), day ('D') or month ('M') of timestamps
+    """
+    if level == 'M':
+        return timestamps.dt.to_period('M').dt.start_time
+    return timestamps.dt.floor('h' if level == 'H' else level)
+
+def derive_rollup(cells: pd.DataFrame, level: str) -> pd.DataFrame:
+    """
+    Derive a coarser level ('D' for days, 'M' for months) from finer cells
+    """
+    return _sum_cells(cells, period_start(cells['timestamp'], level))
+
+@profiled
+def build_rollups(cells: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Materialize every level in ROLLUP_LEVELS from hour-level cells
+    """
+    rollups = {'H': cells}
+    for finer, level in zip(ROLLUP_LEVELS, ROLLUP_LEVELS[1:]):
+        rollups[level] = derive_rollup(rollups[finer], level)
+    return rollups
+
+def select_level(freq: str, start_date=None, end_date=None) -> str:
+    """
+    Pick the coarsest level that answers a `freq` trend exactly for the
+    date range start_date <= timestamp < end_date. Monthly and yearly trends
+    use the month level when the range covers whole months.
+    """
+    whole_months = all(
+        date is None or (date.day == 1 and date == date.normalize())
+        for date in (start_date, end_date)
+    )
+    if freq in ('M', 'Y') and whole_months:
+        return 'M'
+    if freq in ('h', 'H'):
+        return 'H'
+    return 'D'
+
+def select_rollup(rollups: Dict[str, pd.DataFrame], freq: str,
+                  start_date=None, end_date=None) -> pd.DataFrame:
+    """
+    Get the cells of the level chosen by select_level
+    """
+    return rollups[select_level(freq, start_date, end_date)]
+
+def index_rollups(rollups: Dict[str, pd.DataFrame]) -> Dict[str, TimeIndexedFrame]:
+    """
+    Index the cells of every level by time and line/part
+    """
+    return {level: TimeIndexedFrame(cells) for level, cells in rollups.items()}
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from typing import List
+
+# Canonical in-memory types of production data; timestamps are datetime64[ns]
+COMPACT_DTYPES = {
+    'part_number': 'category',
+    'line_number': 'category',
+    'planned_time': 'float32',
+    'runtime': 'float32',
+    'ideal_cycle_time': 'float32',
+    'total_pieces': 'int32',
+    'good_pieces': 'int32'
+}
+
+CATEGORY_COLUMNS = ['part_number', 'line_number']
+
+MEASURE_DTYPES = {col: dtype for col, dtype in COMPACT_DTYPES.items() if col not in CATEGORY_COLUMNS}
+
+def _target_dtype(values: pd.Series, dtype: str) -> str:
+    """
+    Type a column is converted to. Integer columns with values outside the
+    compact range keep 64 bits instead of overflowing.
+    """
+    if dtype == 'int32' and len(values) and values.dtype.kind in 'iuf':
+        info = np.iinfo(np.int32)
+        if values.max() > info.max or values.min() < info.min:
+            return 'int64'
+    return dtype
+
+def to_compact_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert production data to COMPACT_DTYPES with datetime64 timestamps.
+    Returns `df` itself when it already uses the compact types.
+    """
+    conversions = {}
+    if 'timestamp' in df.columns and df['timestamp'].dtype != 'datetime64[ns]':
+        conversions['timestamp'] = pd.to_datetime(df['timestamp']).astype('datetime64[ns]')
+    for col, dtype in COMPACT_DTYPES.items():
+        if col in df.columns:
+            target = _target_dtype(df[col], dtype)
+            if df[col].dtype != target:
+                conversions[col] = df[col].astype(target)
+    if not conversions:
+        return df
+    return df.assign(**conversions)
+
+def concat_compact(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate frames in the compact schema. Categorical columns are
+    unified first, so that they stay categorical in the combined frame.
+    """
+    frames = [to_compact_schema(frame) for frame in frames]
+    if not frames:
+        return pd.DataFrame(columns=list(COMPACT_DTYPES)).astype(COMPACT_DTYPES)
+
+    for col in CATEGORY_COLUMNS:
+        if all(col in frame.columns for frame in frames):
+            categories = union_categoricals([frame[col] for frame in frames]).categories
+            frames = [frame.assign(**{col: frame[col].cat.set_categories(categories)}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
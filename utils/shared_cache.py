@@ -0,0 +1,173 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+import pandas as pd
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+# Upper bound for the memory held by the process-wide cache
+MAX_CACHE_BYTES = int(os.environ.get('OEE_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+
+# Seconds after which a cached result is computed again
+CACHE_TTL = float(os.environ.get('OEE_CACHE_TTL', 3600))
+
+def dataset_key(df: pd.DataFrame) -> str:
+    """
+    Content hash of a dataset, identical for equal data uploaded by
+    different sessions
+    """
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha256(hashes.tobytes())
+    digest.update(','.join(map(str, df.columns)).encode('utf-8'))
+    return digest.hexdigest()
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimate the memory held by a cached value in bytes
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + estimate_size(vars(value))
+    return sys.getsizeof(value)
+
+class SharedCache:
+    """
+    Thread-safe LRU cache shared by all sessions of the process.
+    Entries are evicted least recently used first once the estimated size
+    of all entries exceeds `max_bytes`, and expire `ttl` seconds after they
+    were cached.
+    """
+
+    def __init__(self, max_bytes: int = MAX_CACHE_BYTES, ttl: float = CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, int, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a cached value, or None if the key is not cached
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= time.monotonic():
+                self.bytes -= self._entries.pop(key)[1]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> Any:
+        """
+        Cache a value and evict old entries if the cache is too large.
+        Values larger than the whole cache are returned without caching.
+        """
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+        return value
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Drop all entries whose key matches `predicate`.
+        Returns the number of entries dropped.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self.bytes -= self._entries.pop(key)[1]
+        return len(keys)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Get a cached value, computing and caching it on a miss
+        """
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+
+    def stats(self) -> dict:
+        """
+        Get the number of entries, memory use and hit/miss counts
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+_cache = SharedCache()
+
+def get_shared_cache() -> SharedCache:
+    """
+    Get the process-wide cache shared by all sessions
+    """
+    return _cache
+
+def share_dataset(df: pd.DataFrame) -> Tuple[pd.DataFrame, str]:
+    """
+    Register a dataset in the shared cache. If another session already
+    registered the same content, its copy is returned so that both sessions
+    share one DataFrame.
+    Returns the shared DataFrame and its dataset key.
+    """
+    key = dataset_key(df)
+    return _cache.get_or_compute(('dataset', key), lambda: df), key
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+def versioned_key(source: Hashable, version: Hashable) -> tuple:
+    """
+    Key of the current version of a dataset that changes over time, e.g.
+    the persisted dataset. Once a new version is seen, the results cached
+    for the previous one are dropped instead of waiting for eviction.
+    """
+    with _versions_lock:
+        previous = _versions.get(source)
+        _versions[source] = version
+    if previous is not None and previous != version:
+        stale = (source, previous)
+        _cache.invalidate(lambda key: len(key) > 1 and key[1] == stale)
+    return source, version
+
+def cached(key: Optional[Hashable], name: str, params: tuple, compute: Callable[[], Any]) -> Any:
+    """
+    Get the result `name` for the dataset `key` and the given filter
+    parameters from the shared cache, computing it on a miss. Results for
+    data without a key (e.g. live data) are computed but not cached.
+    """
+    if key is None:
+        return compute()
+    return _cache.get_or_compute((name, key) + tuple(params), compute)
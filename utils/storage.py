@@ -0,0 +1,387 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from datetime import date
+from typing import Callable, List, Optional, Set, Tuple
+from utils.parallel_oee import build_rollup_parallel
+from utils.rollup import KEY_COLUMNS, ROLLUP_COLUMNS, build_rollup
+from utils.profiling import profiled
+from utils.schema import to_compact_schema
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within a process
+    fcntl = None
+
+# Root directory of the persisted production dataset
+DATA_DIR = os.environ.get('OEE_DATA_DIR', 'data_store')
+
+# Hour/part/line rollup cells of the dataset, kept inside the dataset root
+# (pyarrow skips directories starting with '_' when reading the records)
+ROLLUP_SUBDIR = '_rollup'
+
+# Every write publishes a complete version of the dataset as
+# <root>/_versions/<id> (files it does not replace are hard links to the
+# previous version), and the pointer file names the version readers use.
+# Replacing the pointer is the only step that changes what readers see.
+# Datasets written before versions existed are read from <root> itself.
+VERSIONS_SUBDIR = '_versions'
+CURRENT_FILE = '_current'
+LOCK_FILE = '_publish.lock'
+
+# Published versions kept on disk, so that readers which resolved an older
+# version can finish reading it
+KEEP_VERSIONS = 3
+
+# Files are laid out as <version>/date=YYYY-MM-DD/line_number=<line>/part-*.parquet
+PARTITIONING = ds.partitioning(
+    pa.schema([('date', pa.string()), ('line_number', pa.string())]),
+    flavor='hive'
+)
+
+# Upper bound on the date/line partitions a single write may touch
+MAX_PARTITIONS_PER_WRITE = 1_000_000
+
+# Serializes publishing within this process; the lock file serializes it
+# across processes
+_publish_lock = threading.Lock()
+
+@contextmanager
+def publish_lock(root: str = DATA_DIR):
+    """
+    Hold the lock that every writer of the dataset at `root` takes to
+    publish a new version
+    """
+    with _publish_lock:
+        os.makedirs(root, exist_ok=True)
+        with open(os.path.join(root, LOCK_FILE), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Closing the file releases the lock
+            yield
+
+def dataset_path(root: str = DATA_DIR) -> str:
+    """
+    Get the directory of the published version of the dataset
+    """
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return os.path.join(root, VERSIONS_SUBDIR, f.read().strip())
+    except FileNotFoundError:
+        return root
+
+def dataset_exists(root: str = DATA_DIR) -> bool:
+    """
+    Check whether a persisted dataset is available on disk
+    """
+    path = dataset_path(root)
+    return os.path.isdir(path) and any(
+        name.startswith('date=') for name in os.listdir(path)
+    )
+
+def _to_partitioned_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Convert production data to an Arrow table with the partition columns.
+    Rows without a valid timestamp are dropped.
+    """
+    df = df[df['timestamp'].notna()]
+    dates = df['timestamp'].dt.normalize().astype('category')
+    dates = dates.cat.rename_categories(lambda d: d.strftime('%Y-%m-%d'))
+    return pa.Table.from_pandas(
+        df.assign(date=dates.astype(str), line_number=df['line_number'].astype(str)),
+        preserve_index=False
+    )
+
+def _partitions(path: str) -> Set[Tuple[str, str]]:
+    """
+    Get the (date, line) partition directories under `path`
+    """
+    if not os.path.isdir(path):
+        return set()
+    return {
+        (date_dir, line_dir)
+        for date_dir in os.listdir(path) if date_dir.startswith('date=')
+        for line_dir in os.listdir(os.path.join(path, date_dir))
+    }
+
+def _link_partition(source: str, target: str):
+    """
+    Add the files of a partition to a new version without copying them
+    """
+    os.makedirs(target, exist_ok=True)
+    for name in os.listdir(source):
+        try:
+            os.link(os.path.join(source, name), os.path.join(target, name))
+        except OSError:  # no hard links on this filesystem
+            shutil.copy2(os.path.join(source, name), os.path.join(target, name))
+
+def _publish(root: str, staged: str, keep: Callable[[str, Tuple[str, str]], bool]) -> str:
+    """
+    Publish a new version of the dataset made of the partitions of the
+    current version for which keep(subdir, partition) is true and all
+    partitions staged under `staged`, which are moved into it.
+    Must be called with publish_lock(root) held.
+    Returns the id of the new version.
+    """
+    current = dataset_path(root)
+    version = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+    target = os.path.join(root, VERSIONS_SUBDIR, version)
+
+    for subdir in ('', ROLLUP_SUBDIR):
+        source_dir = os.path.join(current, subdir)
+        target_dir = os.path.join(target, subdir)
+        for partition in _partitions(source_dir):
+            if keep(subdir, partition):
+                _link_partition(os.path.join(source_dir, *partition),
+                                os.path.join(target_dir, *partition))
+        staged_dir = os.path.join(staged, subdir)
+        for date_dir, line_dir in _partitions(staged_dir):
+            os.makedirs(os.path.join(target_dir, date_dir), exist_ok=True)
+            os.replace(os.path.join(staged_dir, date_dir, line_dir),
+                       os.path.join(target_dir, date_dir, line_dir))
+    os.makedirs(target, exist_ok=True)
+
+    pointer = os.path.join(root, CURRENT_FILE)
+    pointer_tmp = f"{pointer}.{uuid.uuid4().hex}"
+    with open(pointer_tmp, 'w') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, pointer)
+
+    _remove_old_versions(root)
+    return version
+
+def _remove_old_versions(root: str):
+    """
+    Delete all but the KEEP_VERSIONS newest versions of the dataset. The
+    files of a dataset written before versions existed count as the oldest
+    version.
+    """
+    versions_dir = os.path.join(root, VERSIONS_SUBDIR)
+    versions = sorted(os.listdir(versions_dir))
+    for version in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(versions_dir, version), ignore_errors=True)
+    if len(versions) >= KEEP_VERSIONS:
+        for name in os.listdir(root):
+            if name.startswith('date=') or name == ROLLUP_SUBDIR:
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+class DatasetWriter:
+    """
+    Write production data to the persisted dataset in one or more batches,
+    together with its hour/part/line rollup.
+    Batches are staged inside the dataset root and only become visible on
+    commit(), which publishes a new version with the partitions covered by
+    the staged data replaced and all other partitions kept.
+    """
+
+    def __init__(self, root: str = DATA_DIR):
+        self.root = root
+        self.staging_root = os.path.join(root, f"_staging-{uuid.uuid4().hex}")
+        self.batches = 0
+        self.rows = 0
+
+    def write(self, df: pd.DataFrame) -> int:
+        """
+        Stage a batch of rows. Returns the number of rows staged.
+        """
+        table = _to_partitioned_table(df)
+        if table.num_rows == 0:
+            return 0
+
+        # Cells of an hour split across batches are summed when read
+        rollup = _to_partitioned_table(build_rollup(df))
+        for data, path in ((table, self.staging_root),
+                           (rollup, os.path.join(self.staging_root, ROLLUP_SUBDIR))):
+            ds.write_dataset(
+                data,
+                path,
+                format='parquet',
+                partitioning=PARTITIONING,
+                basename_template=f"part-{self.batches}-{{i}}.parquet",
+                existing_data_behavior='overwrite_or_ignore',
+                # One partition per date and line; long histories exceed
+                # the default limit of 1024 partitions per write
+                max_partitions=MAX_PARTITIONS_PER_WRITE
+            )
+        self.batches += 1
+        self.rows += table.num_rows
+        return table.num_rows
+
+    def commit(self) -> int:
+        """
+        Publish the staged partitions as a new version of the dataset.
+        Returns the number of rows published.
+        """
+        try:
+            if self.rows:
+                staged = _partitions(self.staging_root)
+                with publish_lock(self.root):
+                    _publish(self.root, self.staging_root,
+                             lambda subdir, partition: partition not in staged)
+        finally:
+            self.abort()
+        return self.rows
+
+    def abort(self):
+        """
+        Discard any staged data
+        """
+        shutil.rmtree(self.staging_root, ignore_errors=True)
+
+def save_dataset(df: pd.DataFrame, root: str = DATA_DIR) -> int:
+    """
+    Persist validated production data as Parquet files partitioned by date
+    and line. Partitions covered by `df` are replaced, all other partitions
+    are kept. Rows without a valid timestamp are not stored.
+    Returns the number of rows written.
+    """
+    writer = DatasetWriter(root)
+    writer.write(df)
+    return writer.commit()
+
+def dataset_version(root: str = DATA_DIR) -> str:
+    """
+    Version of the persisted dataset that changes whenever a write is
+    published
+    """
+    path = dataset_path(root)
+    if path != root:
+        return os.path.basename(path)
+    versions = [entry.stat().st_mtime_ns for entry in os.scandir(root) if entry.is_dir()]
+    return str(max(versions + [os.stat(root).st_mtime_ns]))
+
+def get_dataset_date_range(root: str = DATA_DIR) -> Tuple[date, date]:
+    """
+    Get the first and last date of the persisted dataset from the partition
+    layout, without reading any data files
+    """
+    dates = sorted(
+        name.split('=', 1)[1] for name in os.listdir(dataset_path(root))
+        if name.startswith('date=')
+    )
+    return date.fromisoformat(dates[0]), date.fromisoformat(dates[-1])
+
+def _filter_expression(start_date, end_date, lines):
+    """
+    Build the partition and row filter for a date range and lines
+    """
+    filters = []
+    if start_date is not None:
+        start_date = pd.Timestamp(start_date)
+        filters.append(ds.field('date') >= start_date.strftime('%Y-%m-%d'))
+        filters.append(ds.field('timestamp') >= start_date)
+    if end_date is not None:
+        end_date = pd.Timestamp(end_date)
+        filters.append(ds.field('date') <= end_date.strftime('%Y-%m-%d'))
+        filters.append(ds.field('timestamp') < end_date)
+    if lines is not None:
+        filters.append(ds.field('line_number').isin([str(line) for line in lines]))
+
+    expression = None
+    for condition in filters:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+@profiled
+def load_dataset(start_date: Optional[pd.Timestamp] = None,
+                 end_date: Optional[pd.Timestamp] = None,
+                 columns: Optional[List[str]] = None,
+                 lines: Optional[List[str]] = None,
+                 root: str = DATA_DIR) -> pd.DataFrame:
+    """
+    Load the persisted dataset, reading only the requested columns and the
+    partitions that can contain rows with start_date <= timestamp < end_date
+    and, if given, one of the requested lines
+    """
+    return _read_records(dataset_path(root), start_date, end_date, columns, lines)
+
+def _read_records(path: str, start_date=None, end_date=None, columns=None, lines=None) -> pd.DataFrame:
+    """
+    Read the records of the dataset version at `path` (see load_dataset)
+    """
+    dataset = ds.dataset(path, format='parquet', partitioning=PARTITIONING)
+    expression = _filter_expression(start_date, end_date, lines)
+
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != 'date']
+
+    return to_compact_schema(dataset.to_table(columns=columns, filter=expression).to_pandas())
+
+def _filter_cells(cells: pd.DataFrame, start_date, end_date, lines) -> pd.DataFrame:
+    """
+    Get the cells with start_date <= hour < end_date and, if given, one of
+    the requested lines
+    """
+    keep = pd.Series(True, index=cells.index)
+    if start_date is not None:
+        keep &= cells['timestamp'] >= pd.Timestamp(start_date)
+    if end_date is not None:
+        keep &= cells['timestamp'] < pd.Timestamp(end_date)
+    if lines is not None:
+        keep &= cells['line_number'].astype(str).isin([str(line) for line in lines])
+    return cells[keep].reset_index(drop=True)
+
+def _rewrite_rollup(root: str, path: str) -> pd.DataFrame:
+    """
+    Aggregate the rollup of the dataset version at `path` from its records
+    and publish a version with it in place of a missing or outdated rollup,
+    so that later loads read it. Nothing is published if another write has
+    been published since `path` was read.
+    Returns the cells.
+    """
+    cells = build_rollup_parallel(_read_records(path))
+    staging_root = os.path.join(root, f"_staging-{uuid.uuid4().hex}")
+    try:
+        ds.write_dataset(
+            _to_partitioned_table(cells),
+            os.path.join(staging_root, ROLLUP_SUBDIR),
+            format='parquet',
+            partitioning=PARTITIONING,
+            max_partitions=MAX_PARTITIONS_PER_WRITE
+        )
+        with publish_lock(root):
+            if dataset_path(root) == path:
+                _publish(root, staging_root, lambda subdir, partition: subdir != ROLLUP_SUBDIR)
+    except OSError:
+        pass
+    finally:
+        shutil.rmtree(staging_root, ignore_errors=True)
+    return cells
+
+@profiled
+def load_rollup(start_date: Optional[pd.Timestamp] = None,
+                end_date: Optional[pd.Timestamp] = None,
+                lines: Optional[List[str]] = None,
+                root: str = DATA_DIR) -> pd.DataFrame:
+    """
+    Load the hour/part/line rollup of the persisted dataset for
+    start_date <= hour < end_date and, if given, the requested lines.
+    Datasets written without a rollup, or with the cells of an older
+    version, are aggregated from their records once (see _rewrite_rollup).
+    """
+    path = dataset_path(root)
+    rollup_root = os.path.join(path, ROLLUP_SUBDIR)
+    if not os.path.isdir(rollup_root):
+        return _filter_cells(_rewrite_rollup(root, path), start_date, end_date, lines)
+
+    # Read every file with the current cell columns; columns missing from
+    # the files of an older version are read as nulls
+    schema = ds.dataset(rollup_root, format='parquet', partitioning=PARTITIONING).schema
+    for col in ROLLUP_COLUMNS:
+        if col not in schema.names:
+            schema = schema.append(pa.field(col, pa.float64()))
+    dataset = ds.dataset(rollup_root, schema=schema, format='parquet', partitioning=PARTITIONING)
+
+    expression = _filter_expression(start_date, end_date, lines)
+    cells = dataset.to_table(columns=KEY_COLUMNS + ROLLUP_COLUMNS, filter=expression).to_pandas()
+    if cells[ROLLUP_COLUMNS].isna().any(axis=None):
+        return _filter_cells(_rewrite_rollup(root, path), start_date, end_date, lines)
+    return cells.groupby(KEY_COLUMNS, observed=True)[ROLLUP_COLUMNS].sum().reset_index()
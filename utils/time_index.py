@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Sequence, Tuple
+
+class TimeIndexedFrame:
+    """
+    Production data sorted by timestamp with secondary indexes on line,
+    part and line/part.
+    Date ranges are located by binary search, so select() costs
+    O(log n + k) for k matching rows. Unfiltered ranges are returned as
+    slices of the sorted frame rather than copies.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        timestamps = pd.to_datetime(df['timestamp'])
+        if not timestamps.is_monotonic_increasing:
+            order = np.argsort(timestamps.to_numpy(), kind='stable')
+            df = df.take(order)
+            timestamps = timestamps.take(order)
+        self.frame = df.assign(timestamp=timestamps.to_numpy()).reset_index(drop=True)
+        self._timestamps = self.frame['timestamp'].to_numpy()
+        self._indexes: Dict[Tuple[bool, bool], Dict] = {}
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def _positions(self, line, part) -> np.ndarray:
+        """
+        Sorted row positions of a line, a part or a line/part pair
+        """
+        index_key = (line is not None, part is not None)
+        index = self._indexes.get(index_key)
+        if index is None:
+            columns = [col for col, used in zip(['line_number', 'part_number'], index_key) if used]
+            keys = columns[0] if len(columns) == 1 else columns
+            index = self.frame.groupby(keys, observed=True, sort=False).indices
+            self._indexes[index_key] = index
+
+        key = tuple(value for value in (line, part) if value is not None)
+        positions = index.get(key[0] if len(key) == 1 else key)
+        return positions if positions is not None else np.empty(0, dtype='int64')
+
+    def select(self, start_date=None, end_date=None,
+               line: Optional[str] = None, part: Optional[str] = None) -> pd.DataFrame:
+        """
+        Get the rows with start_date <= timestamp < end_date, optionally
+        restricted to a line and/or part
+        """
+        if line is None and part is None:
+            timestamps = self._timestamps
+        else:
+            positions = self._positions(line, part)
+            timestamps = self._timestamps[positions]
+
+        low = 0 if start_date is None else np.searchsorted(
+            timestamps, np.datetime64(pd.Timestamp(start_date)), side='left')
+        high = len(timestamps) if end_date is None else np.searchsorted(
+            timestamps, np.datetime64(pd.Timestamp(end_date)), side='left')
+
+        if line is None and part is None:
+            return self.frame.iloc[low:high]
+        return self.frame.take(positions[low:high])
+
+class IndexedRuns:
+    """
+    Several TimeIndexedFrames with the same columns queried as one, e.g.
+    additive rollup cells kept in runs. select() returns the rows every
+    frame selects, concatenated.
+    """
+
+    def __init__(self, frames: Sequence[TimeIndexedFrame]):
+        self.frames = tuple(frames)
+
+    def __len__(self) -> int:
+        return sum(len(frame) for frame in self.frames)
+
+    def select(self, start_date=None, end_date=None,
+               line: Optional[str] = None, part: Optional[str] = None) -> pd.DataFrame:
+        """
+        Get the rows with start_date <= timestamp < end_date, optionally
+        restricted to a line and/or part
+        """
+        selected = [frame.select(start_date, end_date, line, part) for frame in self.frames]
+        non_empty = [rows for rows in selected if len(rows)]
+        if len(non_empty) > 1:
+            return pd.concat(non_empty, ignore_index=True)
+        return (non_empty or selected or [pd.DataFrame()])[0]